@@ -1,4 +1,6 @@
 """
+Serializer and viewset mixins for the Sal API.
+
 Query fields for Django Rest Framework, based mostly on
 https://github.com/wimglenn/djangorestframework-queryfields
 
@@ -8,9 +10,28 @@ exclude/include fields.
 The modifications here are to add in a special "simple_fields" class attribute.
 Serializers may specify the `simple_fields` which are the subset of
 fields to include when serving simple requests.
+
+RelatedPrefetchMixin is a viewset mixin that fetches the related objects
+its serializer nests in bulk, rather than once per serialized row, and
+loads only the columns the (possibly narrowed) serializer renders.
+
+ExportMixin is a viewset mixin adding a bulk NDJSON export route.
 """
 
 
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+import utils.streaming
+
 from server.models import *
 
 
@@ -73,3 +94,133 @@ class QueryFieldsMixin():
 
         for field in fields_to_drop:
             self.fields.pop(field)
+
+
+class RelatedPrefetchMixin():
+    """Fetch only what the viewset's serializer renders, in bulk."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # The serializer's fields reflect any `fields` query parameters,
+        # so dropped relations aren't fetched and dropped columns aren't
+        # loaded.
+        serializer = self.get_serializer()
+        select, prefetch = related_lookups(serializer)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        field_names = model_field_names(serializer, queryset.model)
+        if field_names is not None:
+            queryset = queryset.only(*field_names)
+        return queryset
+
+
+def related_lookups(serializer, prefix='', many=False):
+    """Return the related lookups needed to render serializer.
+
+    Nested single objects are joined with `select_related`; nested
+    lists, and anything nested below a list, are fetched with
+    `prefetch_related`.
+
+    Args:
+        serializer (Serializer): Serializer to inspect.
+        prefix (str): Lookup path of serializer from the top level.
+        many (bool): Whether serializer is nested below a list.
+
+    Returns:
+        Tuple of lists of select_related and prefetch_related lookups.
+    """
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        lookup = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(lookup)
+            child_select, child_prefetch = related_lookups(field.child, lookup + '__', many=True)
+            prefetch.extend(child_select + child_prefetch)
+        elif isinstance(field, serializers.BaseSerializer):
+            (prefetch if many else select).append(lookup)
+            child_select, child_prefetch = related_lookups(field, lookup + '__', many)
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+    return select, prefetch
+
+
+def model_field_names(serializer, model):
+    """Return the columns to load for serializer, if it needs fewer than all.
+
+    Returns:
+        Set of concrete model field names, or None if every field is
+        needed or the serializer renders something that isn't a model
+        field (and may need any of them).
+    """
+    concrete_fields = {field.name for field in model._meta.concrete_fields}
+    names = set()
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source.split('.')[0])
+        except FieldDoesNotExist:
+            return None
+        if model_field.concrete:
+            names.add(model_field.name)
+    return names if names < concrete_fields else None
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients ask for `application/x-ndjson` from export routes.
+
+    Exports stream their own response; this only renders errors, as a
+    single JSON line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode()
+
+
+class ExportMixin():
+    """Add an `export` route streaming every matching row as NDJSON.
+
+    Rows are read with a server-side cursor (where the database supports
+    one) in chunks, so memory use doesn't depend on the result size. The
+    viewset's filters apply, and `since` limits the export to rows with
+    `export_since_field` at or after an ISO 8601 date and time.
+    """
+
+    export_since_field = None
+    # Extra values to export, as {name: expression}.
+    export_extra_fields = {}
+    export_chunk_size = 2000
+
+    @action(detail=False, renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.queryset.all())
+
+        since = request.query_params.get('since')
+        if since:
+            since_date = parse_datetime(since)
+            if not since_date:
+                raise ValidationError({'since': 'Expected an ISO 8601 date and time.'})
+            if timezone.is_naive(since_date):
+                since_date = timezone.make_aware(since_date, timezone.utc)
+            queryset = queryset.filter(**{f'{self.export_since_field}__gte': since_date})
+
+        columns = [field.attname for field in queryset.model._meta.concrete_fields]
+        rows = (
+            queryset
+            .order_by('pk')
+            .values(*columns, **self.export_extra_fields)
+            .iterator(chunk_size=self.export_chunk_size))
+        lines = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+        return utils.streaming.streaming_response(request, lines, 'application/x-ndjson')
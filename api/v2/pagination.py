@@ -0,0 +1,88 @@
+"""
+Pagination for the Sal API.
+
+Lists are paginated by page number by default. For large tables, clients
+may opt in to cheaper styles with query parameters:
+
+    `?cursor=` switches to keyset pagination ordered by primary key. Every
+    page is an indexed range scan no matter how deep it is, no total count
+    is run, and pages are followed with the `next` and `previous` links.
+
+    `?count=false` keeps page numbers but skips the `COUNT(*)`; `count` is
+    null in the response.
+"""
+
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class UncountedPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class UncountedPaginator(Paginator):
+    """Paginator that fetches one extra row rather than counting them all."""
+
+    count = None
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        return UncountedPage(object_list[:self.per_page], number, self, has_next)
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    ordering = 'pk'
+
+
+class SalPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_pagination = PrimaryKeyCursorPagination()
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+
+        if request.query_params.get(self.count_query_param, '').lower() not in ('false', '0'):
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = UncountedPaginator(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            self.page = paginator.page(page_number)
+        except (EmptyPage, PageNotAnInteger) as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.request = request
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
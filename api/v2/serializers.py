@@ -16,7 +16,7 @@ class InventoryApplicationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+class InventoryItemSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     application = InventoryApplicationSerializer()
 
@@ -25,14 +25,14 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BusinessUnitSerializer(serializers.ModelSerializer):
+class BusinessUnitSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = BusinessUnit
         fields = '__all__'
 
 
-class MachineGroupSerializer(serializers.ModelSerializer):
+class MachineGroupSerializer(QueryFieldsMixin, serializers.ModelSerializer):
     business_unit = serializers.PrimaryKeyRelatedField(
         queryset=BusinessUnit.objects.all())
 
@@ -48,7 +48,7 @@ class PluginScriptSubmissionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class PluginScriptRowSerializer(serializers.ModelSerializer):
+class PluginScriptRowSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     submission = PluginScriptSubmissionSerializer()
 
@@ -57,7 +57,7 @@ class PluginScriptRowSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class FactSerializer(serializers.ModelSerializer):
+class FactSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Fact
@@ -71,36 +71,35 @@ class SerialSerializer(serializers.ModelSerializer):
         fields = ('id', 'serial',)
 
 
-class ManagementSourceSerializer(serializers.ModelSerializer):
+class ManagementSourceSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = ManagementSource
         fields = '__all__'
 
 
-class ManagedItemSerializer(serializers.ModelSerializer):
+class ManagedItemSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = ManagedItem
         fields = '__all__'
 
 
-class ManagedItemHistorySerializer(serializers.ModelSerializer):
+class ManagedItemHistorySerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = ManagedItemHistory
         fields = '__all__'
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Message
         fields = '__all__'
 
 
-# class MachineSerializer(QueryFieldsMixin, serializers.ModelSerializer):
-class MachineSerializer(serializers.ModelSerializer):
+class MachineSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     """
     Only used by saved_search and profiles
@@ -156,7 +155,7 @@ class SearchGroupSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class SavedSearchSerializer(serializers.ModelSerializer):
+class SavedSearchSerializer(QueryFieldsMixin, serializers.ModelSerializer):
     search_groups = SearchGroupSerializer(source='searchgroup_set', read_only=True, many=True)
 
     class Meta:
@@ -171,7 +170,7 @@ class ProfilePayloadSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(QueryFieldsMixin, serializers.ModelSerializer):
 
     payloads = ProfilePayloadSerializer(source='payload_set', read_only=True, many=True)
 
@@ -0,0 +1,78 @@
+"""Tests for the bulk export endpoints."""
+
+
+import gzip
+import json
+
+from django.urls import reverse
+from django.utils.timezone import now
+
+from rest_framework import status
+
+from api.v2.tests.tools import SalAPITestCase
+from server.models import Fact, Machine
+
+
+class ExportTest(SalAPITestCase):
+    """Test NDJSON export."""
+    setup_data = ['create_machine_data']
+
+    def setUp(self):
+        super().setUp()
+        Machine.objects.filter(serial='C0DEADBEEF').update(last_checkin=now())
+        for machine in Machine.objects.all():
+            Fact.objects.create(machine=machine, fact_name='os', fact_data=machine.serial)
+
+    def export(self, name, params=None, **headers):
+        response = self.client.get(reverse(name), params or {}, **self.headers, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export(self):
+        """Ensure every row is exported, one JSON object per line."""
+        rows = self.export('fact-export')
+        self.assertEqual(sorted(row['fact_data'] for row in rows), ['C0DEADBEEF', 'C1DEADBEEF'])
+        self.assertIn('machine_id', rows[0])
+
+    def test_gzip(self):
+        """Ensure clients accepting gzip get it."""
+        rows = self.export('machine-export', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(len(rows), 2)
+
+    def test_accept_ndjson(self):
+        """Ensure clients asking for NDJSON get it, gzipped or not."""
+        rows = self.export('fact-export', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(len(rows), 2)
+        response = self.client.get(
+            reverse('fact-export'), HTTP_ACCEPT='application/x-ndjson', HTTP_ACCEPT_ENCODING='gzip',
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.decode().splitlines()), 2)
+
+    def test_since(self):
+        """Ensure `since` limits the export to recently modified rows."""
+        rows = self.export('fact-export', {'since': '2000-01-01T00:00:00Z'})
+        self.assertEqual([row['fact_data'] for row in rows], ['C0DEADBEEF'])
+
+    def test_filters(self):
+        """Ensure the endpoint's filters apply."""
+        machine = Machine.objects.get(serial='C1DEADBEEF')
+        rows = self.export('machine-export', {'id': machine.pk})
+        self.assertEqual([row['serial'] for row in rows], ['C1DEADBEEF'])
+
+    def test_invalid_since(self):
+        """Ensure unparseable `since` values are rejected."""
+        response = self.authed_get('fact-export', params={'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            reverse('fact-export'), {'since': 'yesterday'}, HTTP_ACCEPT='application/x-ndjson',
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', json.loads(response.content))
@@ -1,6 +1,8 @@
 """Tests for the machines API endpoints."""
 
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -47,3 +49,16 @@ class MachinesTest(SalAPITestCase):
         """Test that machines cannot requested by ID/PK"""
         response = self.authed_get('machine-detail', args=(1,))
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_fields_param(self):
+        """Test that `fields` limits the columns queried, not just returned."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authed_get('machine-list', params={'fields': 'serial,hostname'})
+        self.assertEqual(set(response.data['results'][0]), {'serial', 'hostname'})
+        machine_query = [q['sql'] for q in queries.captured_queries if 'server_machine' in q['sql']][-1]
+        self.assertNotIn('memory', machine_query)
+
+    def test_fields_exclude_param(self):
+        """Test that `fields!` removes fields from the results."""
+        response = self.authed_get('machine-list', params={'fields!': 'memory'})
+        self.assertEqual(set(response.data['results'][0]), ALL_MACHINE_COLUMNS - {'memory'})
@@ -0,0 +1,55 @@
+"""Tests for the API's optional pagination styles."""
+
+
+from rest_framework import status
+
+from api.v2.tests.tools import SalAPITestCase
+from server.models import Fact, Machine
+
+
+FACT_COUNT = 250
+
+
+class PaginationTest(SalAPITestCase):
+    """Test cursor and uncounted pagination."""
+    setup_data = ['create_machine_data']
+
+    def setUp(self):
+        super().setUp()
+        machine = Machine.objects.first()
+        Fact.objects.bulk_create(
+            Fact(machine=machine, fact_name=f'fact{i:03d}', fact_data='data')
+            for i in range(FACT_COUNT))
+        self.expected = [f'fact{i:03d}' for i in range(FACT_COUNT)]
+
+    def follow(self, response):
+        """Return fact names from every page, following `next` links."""
+        names = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(fact['fact_name'] for fact in response.data['results'])
+            if not response.data['next']:
+                return names
+            response = self.client.get(response.data['next'], **self.headers)
+
+    def test_page_number_default(self):
+        """Ensure lists are still paginated by page number and counted."""
+        response = self.authed_get('fact-list')
+        self.assertEqual(response.data['count'], FACT_COUNT)
+
+    def test_cursor(self):
+        """Ensure `cursor` pages through every row in primary key order."""
+        response = self.authed_get('fact-list', params={'cursor': ''})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(self.follow(response), self.expected)
+
+    def test_uncounted(self):
+        """Ensure `count=false` pages through every row without a count."""
+        response = self.authed_get('fact-list', params={'count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(sorted(self.follow(response)), self.expected)
+
+    def test_uncounted_invalid_page(self):
+        """Ensure bad page numbers are rejected."""
+        response = self.authed_get('fact-list', params={'count': 'false', 'page': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,69 @@
+"""Tests that list endpoints don't query once per result."""
+
+
+import itertools
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from api.v2.tests.tools import SalAPITestCase
+from inventory.models import Application, InventoryItem
+from profiles.models import Payload, Profile
+from search.models import SavedSearch, SearchGroup, SearchRow
+from server.models import Machine, PluginScriptRow, PluginScriptSubmission
+
+
+class NestedSerializerQueryTest(SalAPITestCase):
+    """Test nested serializers are fetched in bulk."""
+    setup_data = ['create_machine_data']
+
+    def setUp(self):
+        super().setUp()
+        self.machine = Machine.objects.first()
+        self.counter = itertools.count()
+
+    def test_inventory(self):
+        def create_item():
+            application = Application.objects.create(
+                name=f'App {next(self.counter)}', bundleid='com.example', bundlename='App')
+            InventoryItem.objects.create(machine=self.machine, application=application, version='1')
+
+        self.assertListQueriesConstant('inventoryitem-list', create_item)
+
+        # Excluded relations aren't fetched at all.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authed_get('inventoryitem-list', params={'fields': 'id,version'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'version'})
+        self.assertFalse(any('bundleid' in q['sql'] for q in queries.captured_queries))
+
+    def test_plugin_script_rows(self):
+        def create_item():
+            submission = PluginScriptSubmission.objects.create(
+                machine=self.machine, plugin=f'Plugin{next(self.counter)}')
+            row = PluginScriptRow(
+                submission=submission, pluginscript_name='Row', pluginscript_data='data')
+            row.save()
+
+        self.assertListQueriesConstant('pluginscriptrow-list', create_item)
+
+    def test_profiles(self):
+        def create_item():
+            profile = Profile.objects.create(
+                machine=self.machine, identifier=f'com.example.{next(self.counter)}',
+                install_date=now())
+            Payload.objects.create(profile=profile, identifier=profile.identifier)
+
+        self.assertListQueriesConstant('profile-list', create_item)
+
+    def test_saved_searches(self):
+        user = User.objects.create(username='searcher')
+
+        def create_item():
+            saved_search = SavedSearch.objects.create(created_by=user)
+            group = SearchGroup.objects.create(saved_search=saved_search)
+            SearchRow.objects.create(
+                search_group=group, search_field='hostname', search_term='mac', position=0)
+
+        self.assertListQueriesConstant('savedsearch-list', create_item)
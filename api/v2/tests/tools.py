@@ -5,6 +5,8 @@ import contextlib
 import io
 import sys
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -78,6 +80,29 @@ class SalAPITestCase(APITestCase):
 
         return self.client.get(url, params, **self.headers)
 
+    def assertListQueriesConstant(self, name, create_item, params=None):
+        """Assert a list endpoint's query count doesn't grow with its results.
+
+        Args:
+            name (str): Route name of the list endpoint.
+            create_item (callable): Creates one more item the endpoint
+                lists.
+            params (dict): Query parameters for the request.
+        """
+        create_item()
+        with CaptureQueriesContext(connection) as one_item:
+            self.authed_get(name, params=params)
+        for _ in range(4):
+            create_item()
+        with CaptureQueriesContext(connection) as more_items:
+            response = self.authed_get(name, params=params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            len(more_items), len(one_item),
+            'Query count grew with the number of results:\n' +
+            '\n'.join(query['sql'] for query in more_items.captured_queries))
+
     def authed_options(self, name, args=None, params=None):
         """Perform an authenticated get request to API."""
         if not params:
@@ -1,4 +1,6 @@
+from django.db.models import F
 from django.http import Http404
+from django.utils.http import http_date
 from rest_framework.decorators import action
 from rest_framework import generics
 from rest_framework import status
@@ -9,27 +11,29 @@ from rest_framework.views import APIView
 
 from .serializers import *
 from api.auth import *
-from .mixins import QueryFieldsMixin
-from search.views import *
+from .mixins import ExportMixin, QueryFieldsMixin, RelatedPrefetchMixin
+from search.models import SavedSearch
+from search.views import search_machines
 from server.models import *
 from profiles.models import *
 
 
-class BusinessUnitViewSet(viewsets.ModelViewSet):
+class BusinessUnitViewSet(RelatedPrefetchMixin, viewsets.ModelViewSet):
     queryset = BusinessUnit.objects.all()
     serializer_class = BusinessUnitSerializer
     filter_fields = ('name',)
 
 
-class FactViewSet(viewsets.ReadOnlyModelViewSet):
+class FactViewSet(ExportMixin, RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Fact.objects.all()
     serializer_class = FactSerializer
+    export_since_field = 'machine__last_checkin'
     filter_fields = (
         'machine__serial', 'machine__hostname', 'machine__id',
         'fact_name', 'fact_data')
 
 
-class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryViewSet(ExportMixin, RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     """
     list:
     You may also use the `search` querystring to perform text searches
@@ -40,6 +44,7 @@ class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
+    export_since_field = 'machine__inventory__datestamp'
     filter_fields = (
         'application__name', 'application__bundleid',
         'application__bundlename', 'machine__hostname', 'machine__serial',
@@ -49,15 +54,16 @@ class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
         'application__bundlename',)
 
 
-class MachineGroupViewSet(viewsets.ModelViewSet):
+class MachineGroupViewSet(RelatedPrefetchMixin, viewsets.ModelViewSet):
     queryset = MachineGroup.objects.all()
     serializer_class = MachineGroupSerializer
     filter_fields = ('name', 'business_unit__name', 'business_unit__id')
 
 
-class MachineViewSet(viewsets.ModelViewSet):
+class MachineViewSet(ExportMixin, RelatedPrefetchMixin, viewsets.ModelViewSet):
     queryset = Machine.objects.all()
     serializer_class = MachineSerializer
+    export_since_field = 'last_checkin'
     lookup_field = 'serial'
     filter_fields = (
         'id', 'console_user', 'cpu_speed', 'cpu_type', 'deployed', 'first_checkin', 'hd_percent',
@@ -69,21 +75,22 @@ class MachineViewSet(viewsets.ModelViewSet):
         'machine_model_friendly', 'manifest', 'memory')
 
 
-class ManagementSourceViewSet(viewsets.ReadOnlyModelViewSet):
+class ManagementSourceViewSet(RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ManagementSourceSerializer
     queryset = ManagementSource.objects.all()
 
 
-class ManagedItemViewSet(viewsets.ReadOnlyModelViewSet):
+class ManagedItemViewSet(ExportMixin, RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ManagedItemSerializer
     queryset = ManagedItem.objects.all()
+    export_since_field = 'date_managed'
     filter_fields = (
         'machine__serial', 'machine__hostname', 'machine__id',
         'management_source__name', 'management_source__id', 'status')
     search_fields = ('name', )
 
 
-class ManagedItemHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class ManagedItemHistoryViewSet(RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ManagedItemHistorySerializer
     queryset = ManagedItemHistory.objects.all()
     filter_fields = (
@@ -92,20 +99,22 @@ class ManagedItemHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('name', )
 
 
-class MessageViewSet(viewsets.ReadOnlyModelViewSet):
+class MessageViewSet(RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = MessageSerializer
     queryset = Message.objects.all()
 
 
-class PluginScriptRowViewSet(viewsets.ReadOnlyModelViewSet):
+class PluginScriptRowViewSet(ExportMixin, RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     queryset = PluginScriptRow.objects.all()
     serializer_class = PluginScriptRowSerializer
+    export_since_field = 'submission__recorded'
+    export_extra_fields = {'machine_id': F('submission__machine')}
     filter_fields = (
         'submission__machine__serial', 'submission__machine__hostname',
         'submission__plugin', 'pluginscript_name', 'pluginscript_data_string')
 
 
-class ProfileViewSet(viewsets.ReadOnlyModelViewSet):
+class ProfileViewSet(RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     filter_fields = (
@@ -114,7 +123,7 @@ class ProfileViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('identifier', 'uuid')
 
 
-class SavedSearchViewSet(viewsets.ReadOnlyModelViewSet):
+class SavedSearchViewSet(RelatedPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     """
     execute:
     This endpoint will execute the `SavedSearch`specified by the passed
@@ -125,6 +134,9 @@ class SavedSearchViewSet(viewsets.ReadOnlyModelViewSet):
     `console_user` and  `last_checkin` values.
 
     For example, `/api/saved_searches/666/execute`
+
+    Materialized searches return their stored results, with the time
+    they were computed in the `Last-Modified` header.
     """
     queryset = SavedSearch.objects.all()
     serializer_class = SavedSearchSerializer
@@ -143,4 +155,8 @@ class SavedSearchViewSet(viewsets.ReadOnlyModelViewSet):
         # Pass the "full" parameter to the serializer so it knows
         # how to handle potentially missing fields.
         response_data = MachineSerializer(queryset, many=True, full=full, saved_search=True)
-        return Response(response_data.data)
+        response = Response(response_data.data)
+        saved_search = self.get_object()
+        if saved_search.materialized:
+            response['Last-Modified'] = http_date(saved_search.materialized_at.timestamp())
+        return response
@@ -122,3 +122,12 @@ try:
     INACTIVE_UNDEPLOYED = int(getenv('DOCKER_SAL_INACTIVE_UNDEPLOYED'))
 except Exception:
     INACTIVE_UNDEPLOYED = 0
+
+# Store history tables in monthly Postgres partitions?
+try:
+    if getenv('DOCKER_SAL_PARTITION_HISTORY_TABLES').lower() == 'true':
+        PARTITION_HISTORY_TABLES = True
+    else:
+        PARTITION_HISTORY_TABLES = False
+except Exception:
+    PARTITION_HISTORY_TABLES = False
@@ -0,0 +1,144 @@
+"""Precomputed application install counts
+
+Counting InventoryItems per application across a whole fleet is too slow
+for the application list, detail and CSV views, so they read from
+ApplicationInstallCount, which holds the number of deployed machines'
+installs of each application version per machine group.
+
+`inventory_submit` applies the difference between a machine's old and
+new inventory as it replaces it. Machine.save moves a machine's installs
+when its group or deployed state changes, Machine.delete removes them,
+and `undeploy` does both for a queryset. The `rebuild_install_counts`
+command recounts everything, for use on demand.
+"""
+
+
+import collections
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+import server.utils
+from inventory.models import ApplicationInstallCount, InventoryItem
+
+
+UNDEPLOY_BATCH_SIZE = 500
+
+
+def machine_counts(machine):
+    """Return a Counter of machine's installs keyed by (application ID, version)."""
+    return collections.Counter(
+        machine.inventoryitem_set.order_by().values_list('application_id', 'version'))
+
+
+def update(machine, old_counts, new_counts):
+    """Apply the change from old_counts to new_counts to machine's group."""
+    if not machine.deployed:
+        return
+
+    changes = collections.Counter(new_counts)
+    changes.subtract(old_counts)
+    _apply(changes, machine.machine_group_id, machine.machine_group.business_unit_id)
+
+
+def move(machine, old_group_id, was_deployed):
+    """Move machine's installs after its group or deployed state changed."""
+    counts = machine_counts(machine)
+    if not counts:
+        return
+    with transaction.atomic():
+        if was_deployed:
+            _apply(_negated(counts), old_group_id)
+        if machine.deployed:
+            _apply(counts, machine.machine_group_id, machine.machine_group.business_unit_id)
+
+
+def remove(machine):
+    """Remove machine's installs, before it's deleted."""
+    if machine.deployed:
+        _apply(_negated(machine_counts(machine)), machine.machine_group_id)
+
+
+def undeploy(machines):
+    """Mark machines undeployed, removing their installs.
+
+    Returns:
+        (int) The number of machines undeployed.
+    """
+    pks = list(machines.filter(deployed=True).values_list('pk', flat=True))
+    for start in range(0, len(pks), UNDEPLOY_BATCH_SIZE):
+        batch = machines.model.objects.filter(pk__in=pks[start:start + UNDEPLOY_BATCH_SIZE])
+        with transaction.atomic():
+            removed = (
+                InventoryItem.objects
+                .filter(machine__in=batch.filter(deployed=True))
+                .values('application', 'version', 'machine__machine_group')
+                .annotate(count=Count('id'))
+                .order_by())
+            for row in removed:
+                ApplicationInstallCount.objects.filter(
+                    application_id=row['application'], version=row['version'],
+                    machine_group_id=row['machine__machine_group'],
+                ).update(install_count=F('install_count') - row['count'])
+            ApplicationInstallCount.objects.filter(install_count__lte=0).delete()
+            batch.update(deployed=False)
+    return len(pks)
+
+
+def _negated(counts):
+    return {key: -count for key, count in counts.items()}
+
+
+def _apply(changes, machine_group_id, business_unit_id=None):
+    """Add changes to machine group's counts.
+
+    business_unit_id is only needed if changes has additions.
+    """
+    rows = ApplicationInstallCount.objects.filter(machine_group_id=machine_group_id)
+    removed = False
+    for (application_id, version), change in changes.items():
+        if not change:
+            continue
+        row = rows.filter(application_id=application_id, version=version)
+        updated = row.update(install_count=F('install_count') + change)
+        if not updated and change > 0:
+            # Another submission may create the row first; get_or_create
+            # copes with that, and the update below then adds to it.
+            ApplicationInstallCount.objects.get_or_create(
+                application_id=application_id, machine_group_id=machine_group_id,
+                version=version, defaults={'business_unit_id': business_unit_id})
+            row.update(install_count=F('install_count') + change)
+        removed = removed or change < 0
+
+    if removed:
+        rows.filter(install_count__lte=0).delete()
+
+
+def rebuild():
+    """Recount every install from the InventoryItem table.
+
+    Incremental updates wait for the rebuild to finish, rather than being
+    lost when it replaces the counts. SQLite already allows only one
+    writer at a time.
+    """
+    counts = (
+        InventoryItem.objects
+        .filter(machine__deployed=True)
+        .values('application', 'version', 'machine__machine_group')
+        .annotate(
+            business_unit=F('machine__machine_group__business_unit'),
+            install_count=Count('id'))
+        .order_by())
+    with transaction.atomic():
+        if server.utils.is_postgres():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {ApplicationInstallCount._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        ApplicationInstallCount.objects.all().delete()
+        ApplicationInstallCount.objects.bulk_create(
+            (ApplicationInstallCount(
+                application_id=row['application'], business_unit_id=row['business_unit'],
+                machine_group_id=row['machine__machine_group'], version=row['version'],
+                install_count=row['install_count'])
+             for row in counts.iterator()),
+            batch_size=1000)
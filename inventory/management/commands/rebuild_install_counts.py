@@ -0,0 +1,19 @@
+"""Rebuild the precomputed application install counts."""
+
+
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from inventory import install_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the precomputed application install counts from the inventory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+
+    def handle(self, *args, **options):
+        sleep(options['sleep_time'])
+        install_counts.rebuild()
@@ -0,0 +1,51 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:07
+
+from django.db import migrations, models
+from django.db.models import Count, F
+import django.db.models.deletion
+
+
+def count_installs(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    ApplicationInstallCount = apps.get_model('inventory', 'ApplicationInstallCount')
+    counts = (
+        InventoryItem.objects
+        .filter(machine__deployed=True)
+        .values('application', 'version', 'machine__machine_group')
+        .annotate(
+            business_unit=F('machine__machine_group__business_unit'),
+            install_count=Count('id'))
+        .order_by())
+    ApplicationInstallCount.objects.bulk_create(
+        (ApplicationInstallCount(
+            application_id=row['application'], business_unit_id=row['business_unit'],
+            machine_group_id=row['machine__machine_group'], version=row['version'],
+            install_count=row['install_count'])
+         for row in counts.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0094_auto_20190903_1507'),
+        ('inventory', '0011_remove_inventory_inventory_str'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationInstallCount',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('version', models.CharField(max_length=64)),
+                ('install_count', models.IntegerField(default=0)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.Application')),
+                ('business_unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='server.BusinessUnit')),
+                ('machine_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='server.MachineGroup')),
+            ],
+            options={
+                'unique_together': {('application', 'machine_group', 'version')},
+            },
+        ),
+        migrations.RunPython(count_installs, migrations.RunPython.noop),
+    ]
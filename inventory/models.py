@@ -35,3 +35,20 @@ class InventoryItem(models.Model):
 
     class Meta:
         ordering = ['application', '-version']
+
+
+class ApplicationInstallCount(models.Model):
+    """Installs of each Application version on a MachineGroup's deployed machines.
+
+    Kept up to date by inventory submissions and machine changes, and
+    recounted on demand by the `rebuild_install_counts` command.
+    """
+    id = models.BigAutoField(primary_key=True)
+    application = models.ForeignKey(Application, on_delete=models.CASCADE)
+    business_unit = models.ForeignKey(BusinessUnit, on_delete=models.CASCADE)
+    machine_group = models.ForeignKey(MachineGroup, on_delete=models.CASCADE)
+    version = models.CharField(max_length=64)
+    install_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (('application', 'machine_group', 'version'),)
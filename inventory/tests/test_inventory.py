@@ -1,8 +1,13 @@
 """Tests for the Inventory App"""
 
 
+import csv
+
+from django.core.management import call_command
 from django.test import TestCase
 
+from inventory import install_counts
+from inventory.models import Application, ApplicationInstallCount, InventoryItem
 from server.models import BusinessUnit, MachineGroup, Machine, User, UserProfile
 
 
@@ -101,3 +106,138 @@ class ApplicationDetailTestCase(TestCase):
         self.assertIn('count', response.context['versions'][0])
         self.assertIn('version', response.context['versions'][0])
         self.assertEqual(response.context['application'].bundlename, 'TacoFortress')
+
+    def test_application_detail_counts(self):
+        machine = Machine.objects.get(pk=2)
+        InventoryItem.objects.create(
+            machine=machine, application_id=1, version='201.3.6', path='/Applications/Other.app')
+        install_counts.rebuild()
+        business_unit = BusinessUnit.objects.get(pk=2)
+        business_unit.users.add(self.test_user)
+
+        response = self.client.get('/inventory/application/all/0/1/')
+        self.assertEqual(response.context['install_count'], 2)
+        self.assertEqual(response.context['versions'], [{'version': '201.3.6', 'count': 2}])
+        self.assertEqual(len(response.context['paths']), 2)
+
+
+class CSVExportTestCase(TestCase):
+    """Exercise the inventory CSV export"""
+    fixtures = ['application_fixture.json', 'machine_fixtures.json',
+                'business_unit_fixtures.json', 'machine_group_fixtures.json']
+
+    def setUp(self):
+        self.test_user = User.objects.create(username='test')
+        for business_unit in BusinessUnit.objects.all():
+            business_unit.users.add(self.test_user)
+        self.client.force_login(self.test_user)
+
+    def test_application_list_counts(self):
+        """Ensure install counts are grouped per application."""
+        other = Application.objects.create(name='Other', bundleid='com.example', bundlename='Other')
+        for machine in Machine.objects.all():
+            InventoryItem.objects.create(machine=machine, application=other, version='1')
+        install_counts.rebuild()
+
+        response = self.client.get('/inventory/csv_export/all/0/')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['name', 'bundleid', 'bundlename', 'install_count'])
+        self.assertEqual(rows[1:], [
+            ['Other', 'com.example', 'Other', str(Machine.objects.count())],
+            ['TacoFortress', 'com.sheagcraig.tacofortress', 'TacoFortress', '1']])
+
+
+class InstallCountTestCase(TestCase):
+    """Exercise the precomputed application install counts"""
+    fixtures = ['application_fixture.json', 'machine_fixtures.json',
+                'business_unit_fixtures.json', 'machine_group_fixtures.json']
+
+    def setUp(self):
+        self.machine = Machine.objects.get(pk=2)
+        self.other = Application.objects.create(
+            name='Other', bundleid='com.example', bundlename='Other')
+
+    def counts(self):
+        return set(ApplicationInstallCount.objects.values_list(
+            'application', 'machine_group', 'business_unit', 'version', 'install_count'))
+
+    def test_rebuild(self):
+        InventoryItem.objects.create(machine=self.machine, application_id=1, version='201.3.6')
+        InventoryItem.objects.create(machine=self.machine, application=self.other, version='1')
+        undeployed = Machine.objects.create(serial='UNDEPLOYED', machine_group_id=2, deployed=False)
+        InventoryItem.objects.create(machine=undeployed, application=self.other, version='1')
+
+        call_command('rebuild_install_counts')
+        self.assertEqual(self.counts(), {(1, 1, 1, '201.3.6', 2), (self.other.pk, 1, 1, '1', 1)})
+
+    def test_update(self):
+        install_counts.rebuild()
+        old_counts = install_counts.machine_counts(self.machine)
+        install_counts.update(self.machine, old_counts, {(1, '201.3.6'): 1, (self.other.pk, '2'): 1})
+        self.assertEqual(self.counts(), {(1, 1, 1, '201.3.6', 2), (self.other.pk, 1, 1, '2', 1)})
+
+        old_counts = {(1, '201.3.6'): 1, (self.other.pk, '2'): 1}
+        install_counts.update(self.machine, old_counts, {(self.other.pk, '3'): 1})
+        self.assertEqual(self.counts(), {(1, 1, 1, '201.3.6', 1), (self.other.pk, 1, 1, '3', 1)})
+
+    def test_machine_moved(self):
+        InventoryItem.objects.create(machine=self.machine, application=self.other, version='1')
+        install_counts.rebuild()
+        fixture_count = (1, 1, 1, '201.3.6', 1)
+        machine = Machine.objects.get(pk=self.machine.pk)
+        machine.machine_group_id = 2
+        machine.save()
+        self.assertEqual(self.counts(), {fixture_count, (self.other.pk, 2, 1, '1', 1)})
+
+        machine.deployed = False
+        machine.save()
+        self.assertEqual(self.counts(), {fixture_count})
+        machine.deployed = True
+        machine.save()
+        self.assertEqual(self.counts(), {fixture_count, (self.other.pk, 2, 1, '1', 1)})
+
+        # Saves that don't move the machine leave the counts alone.
+        machine.hostname = 'renamed'
+        machine.save()
+        Machine.objects.get(pk=machine.pk).save()
+        self.assertEqual(self.counts(), {fixture_count, (self.other.pk, 2, 1, '1', 1)})
+
+    def test_machine_deleted(self):
+        install_counts.rebuild()
+        Machine.objects.get(pk=1).delete()
+        self.assertEqual(self.counts(), set())
+
+    def test_undeploy(self):
+        install_counts.rebuild()
+        self.assertEqual(install_counts.undeploy(Machine.objects.all()), Machine.objects.count())
+        self.assertFalse(Machine.deployed_objects.exists())
+        self.assertEqual(self.counts(), set())
+        self.assertEqual(install_counts.undeploy(Machine.objects.all()), 0)
+
+    def test_application_list(self):
+        InventoryItem.objects.create(machine=self.machine, application=self.other, version='1')
+        install_counts.rebuild()
+        user = User.objects.create(username='test')
+        BusinessUnit.objects.get(pk=1).users.add(user)
+        self.client.force_login(user)
+
+        response = self.client.get(
+            '/inventory/business_unit/1/', {'length': 10, 'start': 0, 'draw': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        counts = {row['1']: row['3'] for row in response.json()['data']}
+        self.assertEqual(len(counts), 2)
+        self.assertIn('>1<', counts['com.sheagcraig.tacofortress'])
+        self.assertIn('>1<', counts['com.example'])
+
+    def test_inventory_list_counts(self):
+        InventoryItem.objects.create(machine=self.machine, application_id=1, version='201.3.6')
+        InventoryItem.objects.create(machine=self.machine, application_id=1, version='200')
+        user = User.objects.create(username='test')
+        BusinessUnit.objects.get(pk=1).users.add(user)
+        self.client.force_login(user)
+
+        response = self.client.get(
+            '/inventory/list/business_unit/1/1/',
+            {'length': 10, 'start': 0, 'draw': 1, 'order[0][column]': 4, 'order[0][dir]': 'desc'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual([row['4'] for row in response.json()['data']], ['2', '1'])
@@ -7,7 +7,7 @@ from distutils.version import LooseVersion
 from urllib.parse import quote
 
 # Django
-from django.db.models import Q, Count
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponse, HttpResponseNotFound
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
@@ -24,7 +24,9 @@ from datatableview.views import DatatableView
 # local Django
 import server.utils
 import utils.csv
+from inventory import install_counts
 from inventory.models import Application, Inventory, InventoryItem
+from licenses import usage as license_usage
 from sal.decorators import (class_login_required, class_access_required, key_auth_required)
 from server.models import BusinessUnit, MachineGroup, Machine
 from utils import text_utils
@@ -65,6 +67,9 @@ class GroupMixin():
             MachineGroup: "machine_group",
             Machine: "", },
         Inventory: {}, }
+    install_count_filter = {
+        BusinessUnit: "business_unit",
+        MachineGroup: "machine_group", }
 
     model = None
 
@@ -151,6 +156,38 @@ class GroupMixin():
 
         return queryset
 
+    def get_install_count_kwargs(self, prefix=''):
+        """Return filter kwargs for the group's ApplicationInstallCounts.
+
+        Args:
+            prefix (str): Lookup path from the queryset's model to
+                ApplicationInstallCount, including the trailing '__'.
+
+        Returns:
+            Dict of filter kwargs.
+        """
+        self.group_instance = self.get_group_instance()
+        kwargs = {prefix + 'install_count__gt': 0}
+        if self.group_instance:
+            filter_path = self.install_count_filter[self.classes[self.kwargs['group_type']]]
+            kwargs[prefix + filter_path] = self.group_instance
+        return kwargs
+
+    def get_application_counts(self):
+        """Return the group's Applications annotated with install_count."""
+        if self.kwargs['group_type'] == 'machine':
+            # Install counts aren't precomputed per machine, and one
+            # machine's are cheap to count.
+            queryset = self.filter_queryset_by_group(Application.objects)
+            return queryset.annotate(install_count=Count('inventoryitem'))
+
+        # Filtering and summing in this order keeps both on the same
+        # join.
+        return (
+            Application.objects
+            .filter(**self.get_install_count_kwargs('applicationinstallcount__'))
+            .annotate(install_count=Sum('applicationinstallcount__install_count')))
+
 
 class DatatableQuerystringMixin():
     """Mixin to allow querystrings to work with DatatableViews
@@ -183,13 +220,9 @@ class CSVResponseMixin():
 
 class InventoryList(Datatable):
 
-    # Specifying no source means we cannot sort on this column; however
-    # the source value would be the total number of inventoryitem
-    # records, NOT the number returned by the get_install_count
-    # processor which filters by group_type. Without greatly increasing
-    # the processing time for the view, we therefore cannot sort by
-    # install count.
-    install_count = DisplayColumn("Install Count", source=None, processor='get_install_count')
+    # InventoryListView annotates the count of the machine's matching
+    # inventory items.
+    install_count = DisplayColumn("Install Count", source='install_count')
 
     class Meta:
         columns = ['hostname', 'serial', 'last_checkin', 'console_user', 'install_count']
@@ -205,16 +238,6 @@ class InventoryList(Datatable):
 
         return f'<a href="{url}">{instance.hostname}</a>'
 
-    def get_install_count(self, instance, **kwargs):
-        queryset = instance.inventoryitem_set.filter(application=kwargs['view'].application)
-        field_type = kwargs['view'].field_type
-        field_value = kwargs['view'].field_value
-        if field_type == "path":
-            queryset = queryset.filter(path=field_value)
-        elif field_type == "version":
-            queryset = queryset.filter(version=field_value)
-        return queryset.count()
-
     def format_date(self, instance, **kwargs):
         return instance.last_checkin.strftime("%Y-%m-%d %H:%M:%S")
 
@@ -247,7 +270,9 @@ class InventoryListView(DatatableQuerystringMixin, DatatableView, GroupMixin):
             kwargs['inventoryitem__{}'.format(self.field_type)] = self.field_value
         field_q = Q(**kwargs)
 
-        return queryset.filter(application_q, field_q).distinct()
+        # Counting the join the filter made groups it back down to one
+        # row per machine.
+        return queryset.filter(application_q, field_q).annotate(install_count=Count('inventoryitem'))
 
     def get_context_data(self, **kwargs):
         context = super(InventoryListView, self).get_context_data(**kwargs)
@@ -305,7 +330,7 @@ class ApplicationListView(DatatableView, GroupMixin):
     datatable_class = ApplicationList
 
     def get_queryset(self):
-        queryset = self.filter_queryset_by_group(self.model.objects).distinct()
+        queryset = self.get_application_counts()
 
         crufty_bundles = []
 
@@ -339,8 +364,7 @@ class ApplicationListView(DatatableView, GroupMixin):
         if crufty_pattern:
             queryset = queryset.exclude(bundleid__regex=crufty_pattern)
 
-        # Annotate the install counts in.
-        return queryset.annotate(install_count=Count('inventoryitem'))
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super(ApplicationListView, self).get_context_data(**kwargs)
@@ -367,44 +391,43 @@ class ApplicationDetailView(DetailView, GroupMixin):
 
     def get_context_data(self, **kwargs):
         details = self._get_filtered_queryset()
-        versions, paths = self._get_unique_items(details)
+        versions, paths = self._get_install_counts(details)
         context = super(ApplicationDetailView, self).get_context_data(**kwargs)
-        return self._build_context_data(context, details, versions, paths)
+        return self._build_context_data(context, versions, paths)
 
     def _get_filtered_queryset(self):
         """Filter results based on URL parameters / user access."""
         return self.filter_queryset_by_group(self.object.inventoryitem_set)
 
-    def _get_unique_items(self, details):
-        """Use optimized DB methods for getting unique items if possible."""
-        if server.utils.is_postgres():
-            versions = (details
-                        .order_by("version")
-                        .distinct("version")
-                        .values_list("version", flat=True))
-            paths = details.order_by("path").distinct("path").values_list("path", flat=True)
-        else:
-            details = details.values()
-            versions = {item["version"] for item in details}
-            paths = {item["path"] for item in details}
-
-            # We need to sort the versions for non-Postgres.
-            versions = sorted(list(versions), key=lambda v: LooseVersion(v))
+    def _get_install_counts(self, details):
+        """Count installs per version and per path with one query each.
 
+        Version counts come from the precomputed ApplicationInstallCounts
+        unless the view is for a single machine.
+        """
+        if self.kwargs['group_type'] == 'machine':
+            versions = details.values("version").annotate(count=Count("id"))
+        else:
+            versions = (
+                self.object.applicationinstallcount_set
+                .filter(**self.get_install_count_kwargs())
+                .values("version")
+                .annotate(count=Sum("install_count")))
+        versions = list(versions.order_by("version"))
+        paths = list(details.values("path").annotate(count=Count("id")).order_by("path"))
+        if not server.utils.is_postgres():
+            # Keep the LooseVersion ordering the non-Postgres code path
+            # used before; Postgres keeps the database's ordering.
+            versions.sort(key=lambda v: LooseVersion(v["version"]))
         return (versions, paths)
 
-    def _build_context_data(self, context, details, versions, paths):
-        # Get list of dicts of installed versions and number of installs
-        # for each.
-        context["versions"] = [
-            {"version": version, "count": details.filter(version=version).count()} for version in
-            versions]
-        # Get list of dicts of installation locations and number of
-        # installs for each.
-        context["paths"] = [
-            {"path": path, "count": details.filter(path=path).count()} for path in paths]
+    def _build_context_data(self, context, versions, paths):
+        # Lists of dicts of installed versions and installation
+        # locations, and the number of installs for each.
+        context["versions"] = versions
+        context["paths"] = paths
         # Get the total number of installations.
-        context["install_count"] = details.count()
+        context["install_count"] = sum(version["count"] for version in versions)
         # Add in access data.
         context["group_type"] = self.kwargs['group_type']
         context["group_id"] = self.kwargs['group_id']
@@ -444,12 +467,7 @@ class CSVExportView(CSVResponseMixin, GroupMixin, View):
                 self.components.append(group_id)
 
             fields = APPLICATION_FIELDS
-            # The data we're retuurning is Applications, so get a
-            # queryset of them to remove repetition of InventoryItems.
-            applications = Application.objects.filter(pk__in=queryset.values('application__pk'))
-            # Use the helper function to add attrs that wouldn't
-            # normally be on this model (i.e. install count).
-            data = (self.get_application_entry(item, queryset) for item in applications)
+            data = self.get_application_counts().values(*fields).order_by('name')
 
         else:
             # Inventory List for one application.
@@ -467,16 +485,9 @@ class CSVExportView(CSVResponseMixin, GroupMixin, View):
                 queryset = queryset.filter(version=field_value)
 
             fields = utils.csv.machine_fields()
-            data = (i.machine for i in queryset)
+            data = Machine.objects.filter(pk__in=queryset.values('machine'))
 
-        return utils.csv.get_csv_response(data, fields, self.get_csv_filename())
-
-    def get_application_entry(self, item, queryset):
-        return ApplicationTuple(
-            item.name,
-            item.bundleid,
-            item.bundlename,
-            queryset.filter(application=item).count())
+        return utils.csv.get_csv_response(data, fields, self.get_csv_filename(), self.request)
 
 
 @csrf_exempt
@@ -515,10 +526,12 @@ def inventory_submit(request):
                 except Inventory.DoesNotExist:
                     inventory_meta = Inventory(machine=machine)
                 inventory_meta.sha256hash = hashlib.sha256(inventory_bytes).hexdigest()
+                old_counts = install_counts.machine_counts(machine)
                 # clear existing inventoryitems
                 machine.inventoryitem_set.all().delete()
                 # insert current inventory items
                 inventory_items_to_be_created = []
+                new_counts = collections.Counter()
                 for item in inventory_list:
                     app, _ = Application.objects.get_or_create(
                         bundleid=item.get("bundleid", ""),
@@ -531,6 +544,7 @@ def inventory_submit(request):
                             version=item.get("version", ""),
                             path=item.get('path', ''),
                             machine=machine)
+                        new_counts[(app.id, i_item.version)] += 1
                         if server.utils.is_postgres():
                             inventory_items_to_be_created.append(i_item)
                         else:
@@ -541,6 +555,9 @@ def inventory_submit(request):
                 if server.utils.is_postgres():
                     InventoryItem.objects.bulk_create(inventory_items_to_be_created)
 
+                install_counts.update(machine, old_counts, new_counts)
+                license_usage.invalidate(machine.machine_group.business_unit_id)
+
             return HttpResponse("Inventory submitted for %s.\n" % submission.get('serial'))
 
     return HttpResponse("No inventory submitted.\n")
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from server.models import BusinessUnit
 from inventory.models import InventoryItem
 
@@ -18,28 +19,29 @@ class License(models.Model):
     notes = models.TextField(blank=True)
 
     def used(self):
-        # query inventory items to determine how many licenses have been used.
-        items = InventoryItem.objects.all()
+        # return a count of distinct machines
+        # that have the item we are looking for
+        items = InventoryItem.objects.filter(
+            self.inventory_q(), machine__machine_group__business_unit=self.business_unit_id)
+        return items.values('machine').distinct().count()
+
+    def inventory_q(self):
+        """Return a Q object matching InventoryItems that use this license."""
+        q_object = Q()
         if self.inventory_name:
-            items = items.filter(application__name__exact=self.inventory_name)
+            q_object &= Q(application__name__exact=self.inventory_name)
         if self.inventory_version:
             if self.inventory_version.endswith('*'):
-                items = items.filter(
-                    version__startswith=self.inventory_version[0:-1])
+                q_object &= Q(version__startswith=self.inventory_version[0:-1])
             else:
-                items = items.filter(version__exact=self.inventory_version)
+                q_object &= Q(version__exact=self.inventory_version)
         if self.inventory_bundleid:
-            items = items.filter(application__bundleid__exact=self.inventory_bundleid)
+            q_object &= Q(application__bundleid__exact=self.inventory_bundleid)
         if self.inventory_bundlename:
-            items = items.filter(
-                application__bundlename__exact=self.inventory_bundlename)
+            q_object &= Q(application__bundlename__exact=self.inventory_bundlename)
         if self.inventory_path:
-            items = items.filter(path__exact=self.inventory_path)
-        if self.business_unit:
-            items = items.filter(machine__machine_group__business_unit__exact=self.business_unit)
-        # return a count of distinct machines
-        # that have the item we are looking for
-        return items.values('machine').distinct().count()
+            q_object &= Q(path__exact=self.inventory_path)
+        return q_object
 
     def inventory_query_string(self):
         '''Returns a web query string for use in building URLs that link to
@@ -0,0 +1,69 @@
+"""Tests for batch license usage."""
+
+
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from inventory.models import InventoryItem
+from licenses import usage
+from licenses.models import License
+from server.models import BusinessUnit, MachineGroup, Machine
+
+
+class LicenseUsageTest(TestCase):
+    fixtures = ['application_fixture.json', 'machine_fixtures.json',
+                'business_unit_fixtures.json', 'machine_group_fixtures.json']
+
+    def setUp(self):
+        cache.clear()
+        self.business_unit = BusinessUnit.objects.get(pk=1)
+        self.key = MachineGroup.objects.get(pk=1).key
+        License.objects.create(
+            item_name='TacoFortress', total=1, inventory_name='TacoFortress',
+            business_unit=self.business_unit)
+        License.objects.create(
+            item_name='TacoFortress201', total=5, inventory_version='201.*',
+            business_unit=self.business_unit)
+        License.objects.create(item_name='Everything', total=1, business_unit=self.business_unit)
+        InventoryItem.objects.create(
+            machine=Machine.objects.get(pk=2), application_id=1, version='200.1')
+
+    def test_batch_matches_used(self):
+        with self.assertNumQueries(2):
+            counts = usage.used_counts(self.business_unit)
+        self.assertEqual(counts, {'TacoFortress': 2, 'TacoFortress201': 1, 'Everything': 2})
+        for license in License.objects.all():
+            self.assertEqual(counts[license.item_name], license.used())
+
+    def test_cached_until_invalidated(self):
+        usage.used_counts(self.business_unit)
+        InventoryItem.objects.filter(machine_id=2).delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(usage.used_counts(self.business_unit)['TacoFortress'], 2)
+
+        usage.invalidate(self.business_unit.pk)
+        self.assertEqual(usage.used_counts(self.business_unit)['TacoFortress'], 1)
+
+    def test_criteria_change_recounts(self):
+        usage.used_counts(self.business_unit)
+        License.objects.filter(item_name='TacoFortress').update(inventory_version='200.1')
+        self.assertEqual(usage.used_counts(self.business_unit)['TacoFortress'], 1)
+
+    def test_available(self):
+        response = self.client.get(
+            f'/licenses/available/{self.key}/',
+            {'name': ['TacoFortress', 'TacoFortress201', 'Missing'], 'output_style': 'json'})
+        self.assertEqual(json.loads(response.content), {'TacoFortress': False, 'TacoFortress201': True})
+
+        response = self.client.get(f'/licenses/available/{self.key}/', {'output_style': 'json'})
+        self.assertEqual(
+            json.loads(response.content), {'TacoFortress': -1, 'TacoFortress201': 4, 'Everything': -1})
+
+    def test_usage(self):
+        response = self.client.get(
+            f'/licenses/usage/{self.key}/TacoFortress201/', {'name': 'Missing', 'output_style': 'json'})
+        self.assertEqual(
+            json.loads(response.content),
+            {'TacoFortress201': {'total': 5, 'used': 1, 'available': 4}, 'Missing': {}})
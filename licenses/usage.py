@@ -0,0 +1,90 @@
+"""Batch license seat usage
+
+`License.used` runs a distinct machine count over InventoryItems for a
+single license, and Munki clients ask for seat availability on every
+run. `used_counts` instead counts every License of a business unit in
+one query, and caches the counts until the business unit's next
+inventory submission, a change to its licenses' inventory criteria, or
+`LICENSE_USAGE_CACHE_TTL` seconds (default 600), whichever comes first.
+
+Invalidation only reaches other processes when Django's cache is shared
+between them, e.g. memcached; otherwise the TTL bounds how stale counts
+get.
+"""
+
+
+import functools
+import hashlib
+import operator
+
+from django.core.cache import cache
+from django.db.models import Count
+
+import server.utils
+from inventory.models import InventoryItem
+from licenses.models import License
+
+
+CACHE_KEY = 'license_usage_{}'
+CRITERIA_FIELDS = (
+    'item_name', 'inventory_name', 'inventory_version', 'inventory_bundleid',
+    'inventory_bundlename', 'inventory_path')
+
+
+def used_counts(business_unit, licenses=None):
+    """Return the number of machines using each of business_unit's licenses.
+
+    Args:
+        business_unit (BusinessUnit): Business unit to count.
+        licenses (iterable of License): business_unit's licenses, if
+            they have already been fetched.
+
+    Returns:
+        Dict of license item_name to the number of machines using it.
+    """
+    if licenses is None:
+        licenses = License.objects.filter(business_unit=business_unit)
+    licenses = list(licenses)
+    key = criteria_key(licenses)
+
+    cached = cache.get(CACHE_KEY.format(business_unit.pk))
+    if cached and cached[0] == key:
+        return cached[1]
+
+    counts = count_usage(business_unit, licenses)
+    ttl = server.utils.get_django_setting('LICENSE_USAGE_CACHE_TTL', 600)
+    cache.set(CACHE_KEY.format(business_unit.pk), (key, counts), ttl)
+    return counts
+
+
+def count_usage(business_unit, licenses):
+    """Count the machines using each license with a single query."""
+    if not licenses:
+        return {}
+
+    aggregates = {}
+    queries = []
+    for index, license in enumerate(licenses):
+        q_object = license.inventory_q()
+        # A license without criteria matches every item, which an
+        # empty FILTER clause can't express.
+        aggregates[f'license_{index}'] = (
+            Count('machine', distinct=True, filter=q_object) if q_object else
+            Count('machine', distinct=True))
+        queries.append(q_object)
+
+    items = InventoryItem.objects.filter(machine__machine_group__business_unit=business_unit)
+    if all(queries):
+        items = items.filter(functools.reduce(operator.or_, queries))
+    counts = items.order_by().aggregate(**aggregates)
+    return {license.item_name: counts[f'license_{index}'] for index, license in enumerate(licenses)}
+
+
+def criteria_key(licenses):
+    criteria = [tuple(getattr(license, field) for field in CRITERIA_FIELDS) for license in licenses]
+    return hashlib.sha1(repr(sorted(criteria)).encode()).hexdigest()
+
+
+def invalidate(business_unit_id):
+    """Discard the cached counts for a business unit."""
+    cache.delete(CACHE_KEY.format(business_unit_id))
@@ -6,6 +6,7 @@ from django.http import (Http404, HttpRequest, HttpResponse, HttpResponseRedirec
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.context_processors import csrf
 
+from licenses import usage as license_usage
 from licenses.forms import *
 from licenses.models import *
 from sal.decorators import *
@@ -16,8 +17,18 @@ from server.models import *
 @ga_required
 def license_index(request):
     """Sal index page for licenses."""
+    licenses = list(License.objects.select_related('business_unit'))
+    by_business_unit = {}
+    for license in licenses:
+        by_business_unit.setdefault(license.business_unit, []).append(license)
+    for business_unit, unit_licenses in by_business_unit.items():
+        counts = license_usage.used_counts(business_unit, unit_licenses)
+        for license in unit_licenses:
+            license.seats_used = counts[license.item_name]
+            license.seats_available = license.total - license.seats_used
+
     context = {'request': request,
-               'licenses': License.objects.all(),
+               'licenses': licenses,
                'user': request.user,
                'page': 'licenses'}
     return render(request, 'licenses/index.html', context)
@@ -80,18 +91,17 @@ def available(request, key, item_name=''):
     additional_names = request.GET.getlist('name')
     item_names.extend(additional_names)
     info = {}
+    licenses = list(License.objects.filter(business_unit=business_unit))
+    counts = license_usage.used_counts(business_unit, licenses)
+    totals = {license.item_name: license.total for license in licenses}
     if item_names:
         for name in item_names:
-            try:
-                license = License.objects.get(item_name=name, business_unit=business_unit)
-                info[name] = (license.available() > 0)
-            except (License.DoesNotExist):
-                pass
+            if name in totals:
+                info[name] = (totals[name] - counts[name] > 0)
     else:
         # return everything
-        licenses = License.objects.filter(business_unit=business_unit)
-        for license in licenses:
-            info[license.item_name] = license.available()
+        for name, total in totals.items():
+            info[name] = total - counts[name]
 
     module = json if output_style == 'json' else plistlib
     return HttpResponse(module.dumps(info), content_type='application/json')
@@ -108,15 +118,14 @@ def usage(request, key, item_name=''):
     info = {}
     machine_group = get_object_or_404(MachineGroup, key=key)
     business_unit = machine_group.business_unit
+    licenses = list(License.objects.filter(business_unit=business_unit))
+    counts = license_usage.used_counts(business_unit, licenses)
+    totals = {license.item_name: license.total for license in licenses}
     for name in item_names:
-        try:
-            license = License.objects.get(item_name=name, business_unit=business_unit)
-            info[name] = {'total': license.total,
-                          'used': license.used()}
-            # calculate available instead of hitting the db a second time
-            info[name]['available'] = (
-                info[name]['total'] - info[name]['used'])
-        except (License.DoesNotExist):
+        if name in totals:
+            info[name] = {'total': totals[name], 'used': counts[name]}
+            info[name]['available'] = totals[name] - counts[name]
+        else:
             info[name] = {}
     module = json if output_style == 'json' else plistlib
     return HttpResponse(module.dumps(info), content_type='application/json')
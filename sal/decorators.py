@@ -126,13 +126,20 @@ def get_business_unit_by(model, **kwargs):
     except IndexError:
         raise ValueError('View lacks an ID parameter!')
 
+    # Fetch the business unit along with the instance.
+    queryset = model.objects.all()
+    if model is Machine:
+        queryset = queryset.select_related('machine_group__business_unit')
+    elif model is MachineGroup:
+        queryset = queryset.select_related('business_unit')
+
     try:
-        instance = get_object_or_404(model, pk=pk)
+        instance = get_object_or_404(queryset, pk=pk)
     except ValueError:
         # Sal allows machine serials instead of machine ID in URLs.
         # Handle that special case.
         if model is Machine:
-            instance = get_object_or_404(model, serial=pk)
+            instance = get_object_or_404(queryset, serial=pk)
 
     if isinstance(instance, MachineGroup):
         return (instance, instance.business_unit)
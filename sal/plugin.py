@@ -17,27 +17,34 @@ Public Classes:
     DetailPlugin
     ReportPlugin
     PluginManager
+    PluginRegistry
 """
 
 
 import logging
 import os
+import time
 
 from yapsy.IPlugin import IPlugin
 import yapsy.PluginManager
 
 from django.conf import settings
+from django.core.cache import cache
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.template import loader
 
 from sal.decorators import handle_access, is_global_admin
-from server.models import Machine, Plugin, MachineDetailPlugin, Report
+from server.models import (
+    Machine, Plugin, MachineDetailPlugin, Report, PLUGIN_VERSION_KEY, bump_plugin_version)
 from utils.text_utils import class_to_title
 
 
 logger = logging.getLogger(__name__)
 
+# BasePlugin methods run for every checkin, which plugins may override.
+HOOKS = ('checkin_processor', 'profiles_processor')
+
 
 class OSFamilies():
     chromeos = "ChromeOS"
@@ -54,9 +61,9 @@ class BasePlugin(IPlugin):
         title (str): Plugin `name` that is de-camelcased into a display
             name.
         order (int or None): Plugin's display order value (retrieved from
-            database), or None if it's not enabled.
+            the PluginRegistry), or None if it's not enabled.
         enabled (bool): Whether plugin is enabled for display (retrieved
-            from database).
+            from the PluginRegistry).
         description (str): Plugin description. Defaults to ''
         only_use_deployed_machines (bool): Plugins normally only show
             deployed machines (the default is True). Set to False to
@@ -125,19 +132,11 @@ class BasePlugin(IPlugin):
 
     @property
     def enabled(self):
-        try:
-            self._db_model.objects.get(name=self.name)
-            return True
-        except self._db_model.DoesNotExist:
-            return False
+        return self.name in PluginRegistry.get_orders(self._db_model)
 
     @property
     def order(self):
-        try:
-            db_plugin = self._db_model.objects.get(name=self.name)
-            return db_plugin.order
-        except self._db_model.DoesNotExist:
-            return None
+        return PluginRegistry.get_orders(self._db_model).get(self.name)
 
     def get_template(self, *args, **kwargs):
         """Get the plugin's django template.
@@ -388,9 +387,15 @@ class PluginManager():
 
     Please note; this is separate from the database plugin models,
     which track the enablement and ordering of plugins.
+
+    Plugins are discovered when the WSGI application is created (see
+    `sal.wsgi`), rather than on a worker's first request, and
+    elsewhere on first use. How long that took is logged and kept in
+    `discovery_timings`.
     """
 
     __instance = None
+    discovery_timings = {}
 
     def __init__(self):
         if self.__instance is not None:
@@ -401,17 +406,38 @@ class PluginManager():
     @classmethod
     def get(cls):
         if cls.__instance is None:
+            start = time.perf_counter()
             # initialise the 'inner' PluginManagerDecorator
-            cls.__instance = yapsy.PluginManager.PluginManager()
-            cls.__instance.setPluginPlaces([settings.PLUGIN_DIR, os.path.join(
-                settings.PROJECT_DIR, 'server/plugins')])
-            cls.__instance.collectPlugins()
+            manager = yapsy.PluginManager.PluginManager()
+            places = [settings.PLUGIN_DIR, os.path.join(settings.PROJECT_DIR, 'server/plugins')]
+            manager.setPluginPlaces(places)
+            manager.locatePlugins()
+            # Directory walks aren't ordered, so load the candidates in
+            # a stable order: by plugin place, then by path. When two
+            # plugins share a name, the same one always wins.
+            candidates = manager.getPluginCandidates()
+            for candidate in candidates:
+                manager.removePluginCandidate(candidate)
+            for candidate in sorted(candidates, key=lambda c: _candidate_sort_key(c[0], places)):
+                manager.appendPluginCandidate(candidate)
+            located = time.perf_counter()
+            manager.loadPlugins()
             # Move this attribute because we don't use the container
             # object in Sal. Set it once here rather than at every
             # retrieval!
-            for plugin in cls.__instance.getAllPlugins():
+            for plugin in manager.getAllPlugins():
                 plugin.plugin_object.path = plugin.path
-            logger.debug("PluginManagerSingleton initialised")
+            loaded = time.perf_counter()
+
+            cls.discovery_timings = {
+                'plugins': len(manager.getAllPlugins()),
+                'locate_seconds': located - start,
+                'load_seconds': loaded - located}
+            logger.info(
+                "Discovered %d plugins in %.0fms (%.0fms locating, %.0fms loading)",
+                cls.discovery_timings['plugins'], (loaded - start) * 1000,
+                (located - start) * 1000, (loaded - located) * 1000)
+            cls.__instance = manager
         return cls.__instance
 
     @classmethod
@@ -445,3 +471,139 @@ class PluginManager():
         """
         # Throw away container object; we don't use it.
         return [p.plugin_object for p in cls.get().getAllPlugins()]
+
+
+def _candidate_sort_key(info_file, places):
+    for index, place in enumerate(places):
+        if os.path.abspath(info_file).startswith(os.path.abspath(place) + os.sep):
+            return (index, info_file)
+    return (len(places), info_file)
+
+
+class PluginRegistry():
+    """Caches the enabled plugins, their order, and their instances
+
+    The Plugin, MachineDetailPlugin, and Report tables record which
+    plugins are enabled. Saving or deleting any of their records bumps a
+    version in Django's cache, and each process reloads its registry
+    the next time it is used after that.
+
+    When the cache isn't shared between processes (e.g. the default
+    local memory cache), other processes pick up changes after
+    `PLUGIN_REGISTRY_TTL` seconds (default 60) instead.
+    """
+
+    _enabled = None
+    _orders = None
+    _hooks = None
+    _version = None
+    _loaded_at = 0
+    # (plugin name, hook): [calls, total seconds, slowest seconds]
+    hook_timings = {}
+
+    @classmethod
+    def get_enabled(cls, model=None):
+        """Return enabled plugin instances, in display order.
+
+        Args:
+            model: One of Plugin, MachineDetailPlugin, or Report, or
+                None for the enabled plugins of all three, with reports
+                first and detail plugins last.
+
+        Returns:
+            List of Widget, DetailPlugin, or ReportPlugin instances.
+            Enabled plugins that can't be found on disk are left out.
+        """
+        return cls._get()[0][model]
+
+    @classmethod
+    def get_orders(cls, model):
+        """Return a dict of the names of model's records to their order.
+
+        Reports have no order, so their values are None.
+        """
+        return cls._get()[1][model]
+
+    @classmethod
+    def get_hook_plugins(cls, hook, model=None):
+        """Return the enabled plugins that override a BasePlugin hook.
+
+        Args:
+            hook (str): One of HOOKS.
+            model: As for `get_enabled`.
+        """
+        cls._get()
+        return cls._hooks[hook][model]
+
+    @classmethod
+    def run_hook(cls, hook, *args, models=(None,)):
+        """Call hook on each enabled plugin that implements it.
+
+        Each call is timed. The timings are totalled in `hook_timings`,
+        and calls slower than `PLUGIN_HOOK_WARNING_SECONDS` (default 1)
+        are logged as warnings.
+
+        Args:
+            hook (str): One of HOOKS.
+            *args: Arguments for the hook.
+            models (tuple): Plugin models whose enabled plugins to run,
+                in order, as for `get_enabled`.
+        """
+        threshold = getattr(settings, 'PLUGIN_HOOK_WARNING_SECONDS', 1)
+        for model in models:
+            for plugin in cls.get_hook_plugins(hook, model):
+                start = time.perf_counter()
+                getattr(plugin, hook)(*args)
+                elapsed = time.perf_counter() - start
+
+                timing = cls.hook_timings.setdefault((plugin.name, hook), [0, 0.0, 0.0])
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = max(timing[2], elapsed)
+                if elapsed > threshold:
+                    logger.warning("%s.%s took %.2fs", plugin.name, hook, elapsed)
+                else:
+                    logger.debug("%s.%s took %.3fs", plugin.name, hook, elapsed)
+
+    @classmethod
+    def invalidate(cls):
+        bump_plugin_version()
+        cls._enabled = None
+
+    @classmethod
+    def _get(cls):
+        version = cache.get(PLUGIN_VERSION_KEY)
+        ttl = getattr(settings, 'PLUGIN_REGISTRY_TTL', 60)
+        if (cls._enabled is None or version != cls._version or
+                time.monotonic() - cls._loaded_at > ttl):
+            cls._load(version)
+        return cls._enabled, cls._orders
+
+    @classmethod
+    def _load(cls, version):
+        enabled = {}
+        orders = {}
+        for model in (Report, Plugin, MachineDetailPlugin):
+            if model is Report:
+                records = model.objects.values_list('name', flat=True)
+                orders[model] = {name: None for name in records}
+            else:
+                orders[model] = dict(model.objects.values_list('name', 'order'))
+            plugins = (PluginManager.get_plugin_by_name(name) for name in orders[model])
+            enabled[model] = [plugin for plugin in plugins if plugin]
+
+        # Most plugins inherit BasePlugin's no-op hooks; don't bother
+        # calling those.
+        enabled[None] = enabled[Report] + enabled[Plugin] + enabled[MachineDetailPlugin]
+        hooks = {}
+        for hook in HOOKS:
+            default = getattr(BasePlugin, hook)
+            hooks[hook] = {
+                model: [plugin for plugin in plugins if getattr(type(plugin), hook) is not default]
+                for model, plugins in enabled.items()}
+
+        cls._enabled = enabled
+        cls._orders = orders
+        cls._hooks = hooks
+        cls._version = version
+        cls._loaded_at = time.monotonic()
@@ -0,0 +1,20 @@
+# Django settings for sal project.
+from sal.system_settings import *
+import os
+
+BASIC_AUTH = True
+
+DATABASES = {
+    'default': {
+        # Add 'postgresql_psycopg2', 'mysql', 'sqlite3' or 'oracle'.
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Or path to database file if using sqlite3.
+        'NAME': os.path.join(PROJECT_DIR, 'sal.db'),
+        # The following settings are not used with sqlite3:
+        'USER': '',
+        'PASSWORD': '',
+        # Empty for localhost through domain sockets or '127.0.0.1' for localhost through TCP.
+        'HOST': '',
+        'PORT': '',                      # Set to empty string for default.
+    }
+}
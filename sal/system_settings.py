@@ -22,6 +22,13 @@ ADD_TO_ALL_BUSINESS_UNITS = False
 ADD_NEW_MACHINES = True
 INACTIVE_UNDEPLOYED = 0
 SEARCH_FACTS = []
+# Use the database search index built by `manage.py quick_search_index`
+# for the search box (Postgres or SQLite only).
+QUICK_SEARCH_INDEX = False
+# Seconds before a materialized saved search's stored results are
+# recomputed on read. `manage.py refresh_saved_searches` refreshes them
+# on a schedule too.
+SAVED_SEARCH_MATERIALIZED_TTL = 3600
 SEARCH_CONDITIONS = []
 DATA_UPLOAD_MAX_NUMBER_FIELDS = None
 TEMPLATES = [
@@ -88,6 +95,11 @@ HISTORICAL_FACTS = [
 # How long to keep historical facts around before pruning them.
 HISTORICAL_DAYS = 180
 
+# Postgres only: store HistoricalFact and ManagedItemHistory in monthly
+# partitions so expired months can be dropped instantly. Existing tables
+# must be converted once with `manage.py partition_maintenance --convert`.
+PARTITION_HISTORY_TABLES = False
+
 # Facts to be discarded and not saved to the database
 IGNORE_FACTS = []
 
@@ -294,8 +306,7 @@ REST_FRAMEWORK = {
         'api.auth.ApiKeyAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': ('api.auth.HasRWPermission',),
-    'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.v2.pagination.SalPagination',
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
     'PAGE_SIZE': 100,
     'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
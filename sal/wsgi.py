@@ -32,6 +32,11 @@ if 'DYNO' in os.environ:
 else:
     application = get_wsgi_application()
 
+# Discover plugins while the worker boots rather than during its first
+# request.
+from sal.plugin import PluginManager  # noqa: E402
+PluginManager.get()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)
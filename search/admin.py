@@ -14,8 +14,9 @@ class SearchRowInline(admin.StackedInline):
 
 class SavedSearchAdmin(admin.ModelAdmin):
     inlines = [SearchGroupInline, ]
-    list_display = ('name', 'created_by', 'created', 'save_search')
-    list_filter = ('created', 'save_search')
+    list_display = ('name', 'created_by', 'created', 'save_search', 'materialized',
+                    'materialized_at')
+    list_filter = ('created', 'save_search', 'materialized')
     date_hierarchy = 'created'
     search_fields = ('name', 'created_by')
 
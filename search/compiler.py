@@ -0,0 +1,131 @@
+"""Compiles SavedSearches into Machine filters
+
+Each SearchRow against a related model becomes a correlated `EXISTS`
+subquery rather than a join, so rows don't multiply each other's
+cardinality and the results never need a DISTINCT.
+
+Compiled filters are cached on the content of the search's groups and
+rows, so editing a search is its own cache invalidation.
+"""
+
+
+import functools
+
+from django.db.models import Exists, OuterRef, Q
+
+from inventory.models import InventoryItem
+from profiles.models import Payload, Profile
+from search.models import SearchRow
+from server.models import Fact, PluginScriptRow
+
+
+OPERATORS = {
+    'Contains': 'icontains',
+    '=': 'exact',
+    # Negated when compiled.
+    '!=': 'exact',
+    '<': 'lt',
+    '<=': 'lte',
+    '>': 'gt',
+    '>=': 'gte',
+}
+
+APPLICATION_FIELDS = {
+    'Name': 'name',
+    'Bundle ID': 'bundleid',
+    'Path': 'path',
+    'Bundle Name': 'bundlename',
+}
+
+ROW_VALUES = (
+    'search_group__and_or', 'search_group_id', 'and_or', 'search_models', 'search_field',
+    'operator', 'search_term')
+
+
+def search_query(saved_search):
+    """Return a Q object filtering Machines to saved_search's results.
+
+    Args:
+        saved_search (SavedSearch): The search to compile.
+
+    Returns:
+        Q object for use in a Machine queryset's `filter`.
+    """
+    return _compile(search_rows(saved_search))
+
+
+def search_rows(saved_search):
+    """Return the criteria of saved_search as a hashable tuple."""
+    rows = (
+        SearchRow.objects
+        .filter(search_group__saved_search=saved_search)
+        .order_by('search_group__position', 'search_group_id', 'position', 'id')
+        .values_list(*ROW_VALUES))
+    return tuple(rows)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(rows):
+    queries = Q()
+    group_queries = None
+    current_group = None
+    group_operator = None
+    for group_and_or, group_id, and_or, model, field, operator, term in rows:
+        q_object = _compile_row(model, field, operator, term)
+        if group_id != current_group:
+            if group_queries is not None:
+                queries = _combine(queries, group_queries, group_operator)
+            # The first group's (and first row's) operator is ignored.
+            group_operator = group_and_or if current_group is not None else None
+            current_group = group_id
+            group_queries = q_object
+        else:
+            group_queries = _combine(group_queries, q_object, and_or)
+
+    if group_queries is not None:
+        queries = _combine(queries, group_queries, group_operator)
+    return queries
+
+
+def _combine(left, right, operator):
+    if operator is None:
+        return right
+    return left | right if operator == 'OR' else left & right
+
+
+def _compile_row(model, field, operator, term):
+    lookup = OPERATORS[operator]
+
+    if model == 'Machine':
+        return _negate_if_needed(Q(**{f'{field}__{lookup}': term}), operator)
+
+    if model == 'Facter':
+        related = Fact.objects.filter(
+            machine=OuterRef('pk'), fact_name=field, **{f'fact_data__{lookup}': term})
+    elif model == 'Application Inventory':
+        related = InventoryItem.objects.filter(
+            machine=OuterRef('pk'), **{f'application__{APPLICATION_FIELDS[field]}__{lookup}': term})
+    elif model == 'Application Version':
+        app_name, bundleid = field.split('=>')
+        related = InventoryItem.objects.filter(
+            machine=OuterRef('pk'), application__name=app_name,
+            application__bundleid=bundleid, **{f'version__{lookup}': term})
+    elif model == 'External Script':
+        plugin_name, row = field.split('=>')
+        related = PluginScriptRow.objects.filter(
+            submission__machine=OuterRef('pk'),
+            submission_and_script_name=f'{plugin_name}: {row}',
+            **{f'pluginscript_data__{lookup}': term})
+    elif model == 'Profile':
+        related = Profile.objects.filter(machine=OuterRef('pk'), **{f'{field}__{lookup}': term})
+    elif model == 'Profile Payload':
+        related = Payload.objects.filter(
+            profile__machine=OuterRef('pk'), **{f'{field}__{lookup}': term})
+    else:
+        raise ValueError(f'Unknown search model {model}')
+
+    return _negate_if_needed(Q(Exists(related.values('pk'))), operator)
+
+
+def _negate_if_needed(q_object, operator):
+    return ~q_object if operator == '!=' else q_object
@@ -12,7 +12,7 @@ class ChoiceFieldNoValidation(forms.ChoiceField):
 class SaveSearchForm(forms.ModelForm):
     class Meta:
         model = SavedSearch
-        fields = ('name',)
+        fields = ('name', 'materialized')
 
 
 class SearchRowForm(forms.ModelForm):
@@ -0,0 +1,73 @@
+'''Times the quick search with and without the search index on generated data'''
+
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from search import search_index
+from search.models import SearchCache
+from search.views import quick_search
+from server.models import BusinessUnit, Machine, MachineGroup
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the quick search with and without the search index against generated machines. '
+        'All generated data is rolled back, but the tables are locked while it runs, so do '
+        'not run this against a production database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            'queries', nargs='*', default=['C02', 'mac-0042', 'jdoe', 'nomatch'],
+            help='Search strings to time.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_fixture(options['machines'])
+            search_index.create_index()
+            self.stdout.write(f"{'query':<16}{'results':>10}{'scan ms':>12}{'index ms':>12}")
+            for query in options['queries']:
+                with override_settings(QUICK_SEARCH_INDEX=False):
+                    count, scan = self.time_query(query, options['repeat'])
+                with override_settings(QUICK_SEARCH_INDEX=True):
+                    _, indexed = self.time_query(query, options['repeat'])
+                self.stdout.write(f'{query:<16}{count:>10}{scan:>12.1f}{indexed:>12.1f}')
+            transaction.set_rollback(True)
+
+    def create_fixture(self, count):
+        random.seed(0)
+        business_unit = BusinessUnit.objects.create(name='Benchmark')
+        group = MachineGroup.objects.create(name='Benchmark', business_unit=business_unit)
+        users = [''.join(random.choices(string.ascii_lowercase, k=6)) for _ in range(500)]
+        users.append('jdoe')
+        machines = (
+            Machine(
+                machine_group=group,
+                serial=f'C02{i:09d}',
+                hostname=f'mac-{i:06d}',
+                console_user=random.choice(users),
+                operating_system=random.choice(('10.14.6', '10.15.7', '11.2.3')),
+                machine_model=random.choice(('MacBookPro15,1', 'iMac19,1', 'Macmini8,1')))
+            for i in range(count))
+        Machine.objects.bulk_create(machines)
+
+        cache_items = (
+            SearchCache(machine_id=pk, search_item=f'asset-{pk}')
+            for pk in Machine.objects.filter(machine_group=group).values_list('pk', flat=True))
+        SearchCache.objects.bulk_create(cache_items)
+
+    def time_query(self, query, repeat):
+        """Return result count and fastest time in milliseconds."""
+        machines = Machine.objects.all()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(list(quick_search(machines, query)))
+            timings.append((time.perf_counter() - start) * 1000)
+        return count, min(timings)
@@ -0,0 +1,26 @@
+'''Builds or removes the database index used by the quick search box'''
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from search import search_index
+
+
+class Command(BaseCommand):
+    help = 'Builds or removes the database index used by the quick search box'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drop', action='store_true', help='Remove the index instead of building it.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError('The quick search index requires Postgres or SQLite.')
+
+        if options['drop']:
+            search_index.drop_index()
+            self.stdout.write('Quick search index removed.')
+        else:
+            search_index.create_index()
+            self.stdout.write(
+                'Quick search index built. Set QUICK_SEARCH_INDEX = True to use it.')
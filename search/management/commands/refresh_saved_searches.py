@@ -0,0 +1,23 @@
+'''Refreshes the stored results of materialized saved searches'''
+
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from search import materialized
+from search.models import SavedSearch
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the stored results of materialized saved searches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Refresh every materialized search, even those refreshed recently.')
+
+    def handle(self, *args, **options):
+        sleep(options['sleep_time'])
+        for saved_search in SavedSearch.objects.filter(materialized=True):
+            materialized.refresh(saved_search, force=options['force'])
@@ -1,10 +1,12 @@
-'''Cleans up old searches and rebuilds search fields cache'''
+'''Cleans up old searches and updates the search fields cache'''
 
 from time import sleep
 import gc
+import time
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 
 from inventory.models import *
@@ -17,11 +19,19 @@ import server.utils
 import datetime
 
 
+# Machines that checked in this long before the previous run started
+# are reprocessed, so a checkin that was mid-flight isn't missed.
+CHANGE_OVERLAP = 300
+
+
 class Command(BaseCommand):
-    help = 'Cleans up old searches and rebuilds search fields cache'
+    help = 'Cleans up old searches and updates the search fields cache'
 
     def add_arguments(self, parser):
         parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild the search caches from scratch rather than processing only changes.')
 
     def handle(self, *args, **options):
 
@@ -31,8 +41,74 @@ class Command(BaseCommand):
             created__lt=datetime.datetime.today() - datetime.timedelta(days=30), save_search=False)
         old_searches.delete()
 
-        search_fields = []
+        run_start = int(time.time())
+        last_run = server.utils.get_setting('search_maintenance_last_run')
+        last_full_run = server.utils.get_setting('search_maintenance_last_full_run', 0)
+
+        # Incremental updates never remove field names that have gone
+        # away, so still do a full rebuild once a day.
+        if (options['full'] or not last_run or
+                last_full_run < run_start - server.utils.TWENTY_FOUR_HOURS):
+            self.rebuild_search_fields()
+            self.rebuild_search_cache()
+            server.utils.set_setting('search_maintenance_last_full_run', run_start)
+        else:
+            since = datetime.datetime.fromtimestamp(
+                last_run - CHANGE_OVERLAP, tz=datetime.timezone.utc)
+            self.update_search_fields(since)
+            self.update_search_cache(since)
+
+        server.utils.set_setting('search_maintenance_last_run', run_start)
+        gc.collect()
+
+    def rebuild_search_fields(self):
+        facts = Fact.objects.values('fact_name').distinct()
+        plugin_script_rows = PluginScriptRow.objects.values(
+            'pluginscript_name', 'submission__plugin').distinct()
+        app_versions = Application.objects.values('name', 'bundleid').distinct()
 
+        search_fields = self.get_model_fields()
+        search_fields.extend(self.get_fact_fields(facts))
+        search_fields.extend(self.get_plugin_script_fields(plugin_script_rows))
+        search_fields.extend(self.get_application_fields(app_versions))
+
+        with transaction.atomic():
+            SearchFieldCache.objects.all().delete()
+            SearchFieldCache.objects.bulk_create(search_fields, ignore_conflicts=True)
+
+    def update_search_fields(self, since):
+        """Add field names submitted by machines that changed since `since`.
+
+        Existing names are skipped by the database (INSERT ... ON
+        CONFLICT DO NOTHING on Postgres), so the cost of a run depends
+        on the number of checkins rather than the size of the fleet.
+        """
+        changed_machines = Machine.objects.filter(last_checkin__gte=since).values('pk')
+        inventoried_machines = Inventory.objects.filter(datestamp__gte=since).values('machine')
+
+        facts = (
+            Fact.objects
+            .filter(machine__in=changed_machines)
+            .values('fact_name')
+            .distinct())
+        plugin_script_rows = (
+            PluginScriptRow.objects
+            .filter(submission__machine__in=changed_machines)
+            .values('pluginscript_name', 'submission__plugin')
+            .distinct())
+        app_versions = (
+            Application.objects
+            .filter(inventoryitem__machine__in=inventoried_machines)
+            .values('name', 'bundleid')
+            .distinct())
+
+        search_fields = self.get_model_fields()
+        search_fields.extend(self.get_fact_fields(facts))
+        search_fields.extend(self.get_plugin_script_fields(plugin_script_rows))
+        search_fields.extend(self.get_application_fields(app_versions))
+        SearchFieldCache.objects.bulk_create(search_fields, ignore_conflicts=True)
+
+    def get_model_fields(self):
         skip_fields = [
             'id',
         ]
@@ -44,69 +120,61 @@ class Command(BaseCommand):
             'Path'
         ]
 
-        facts = Fact.objects.values('fact_name').distinct()
-        plugin_sript_rows = PluginScriptRow.objects.values(
-            'pluginscript_name', 'submission__plugin').distinct()
-        app_versions = Application.objects.values('name', 'bundleid').distinct()
-
-        old_cache = SearchFieldCache.objects.all()
-        if server.utils.is_postgres() is False:
-            old_cache.delete()
+        search_fields = []
         for f in Machine._meta.fields:
             if f.name not in skip_fields:
-                cached_item = SearchFieldCache(search_model='Machine', search_field=f.name)
-                search_fields.append(cached_item)
-                if server.utils.is_postgres() is False:
-                    cached_item.save()
-
-        for fact in facts.iterator():
-            cached_item = SearchFieldCache(search_model='Facter', search_field=fact['fact_name'])
-            search_fields.append(cached_item)
-            if server.utils.is_postgres() is False:
-                cached_item.save()
-
-        for row in plugin_sript_rows.iterator():
-            string = '%s=>%s' % (row['submission__plugin'], row['pluginscript_name'])
-            cached_item = SearchFieldCache(search_model='External Script', search_field=string)
-            search_fields.append(cached_item)
-            if server.utils.is_postgres() is False:
-                cached_item.save()
+                search_fields.append(SearchFieldCache(search_model='Machine', search_field=f.name))
 
         for inventory_field in inventory_fields:
-            cached_item = SearchFieldCache(
-                search_model='Application Inventory', search_field=inventory_field)
-            search_fields.append(cached_item)
-            if server.utils.is_postgres() is False:
-                cached_item.save()
-
-        for app in app_versions.iterator():
-            string = '%s=>%s' % (app['name'], app['bundleid'])
-            cached_item = SearchFieldCache(search_model='Application Version', search_field=string)
-            search_fields.append(cached_item)
-            if server.utils.is_postgres() is False:
-                cached_item.save()
+            search_fields.append(SearchFieldCache(
+                search_model='Application Inventory', search_field=inventory_field))
 
         for f in Profile._meta.fields:
             if f.name not in skip_fields:
-                cached_item = SearchFieldCache(search_model='Profile', search_field=f.name)
-                search_fields.append(cached_item)
-                if server.utils.is_postgres() is False:
-                    cached_item.save()
+                search_fields.append(SearchFieldCache(search_model='Profile', search_field=f.name))
 
         for f in Payload._meta.fields:
             if f.name not in skip_fields:
-                cached_item = SearchFieldCache(search_model='Profile Payload', search_field=f.name)
-                search_fields.append(cached_item)
-                if server.utils.is_postgres() is False:
-                    cached_item.save()
+                search_fields.append(
+                    SearchFieldCache(search_model='Profile Payload', search_field=f.name))
+
+        return search_fields
 
-        if server.utils.is_postgres() is True:
-            old_cache.delete()
-            SearchFieldCache.objects.bulk_create(search_fields)
+    def get_fact_fields(self, facts):
+        return [
+            SearchFieldCache(search_model='Facter', search_field=fact['fact_name'])
+            for fact in facts.iterator()]
+
+    def get_plugin_script_fields(self, plugin_script_rows):
+        search_fields = []
+        for row in plugin_script_rows.iterator():
+            string = '%s=>%s' % (row['submission__plugin'], row['pluginscript_name'])
+            search_fields.append(
+                SearchFieldCache(search_model='External Script', search_field=string))
+        return search_fields
 
+    def get_application_fields(self, app_versions):
+        search_fields = []
+        for app in app_versions.iterator():
+            string = '%s=>%s' % (app['name'], app['bundleid'])
+            search_fields.append(
+                SearchFieldCache(search_model='Application Version', search_field=string))
+        return search_fields
+
+    def rebuild_search_cache(self):
+        SearchCache.objects.all().delete()
+        self.create_search_cache(Fact.objects.all())
+
+    def update_search_cache(self, since):
+        """Replace the fact cache for only the machines that changed."""
+        changed_machines = Machine.objects.filter(last_checkin__gte=since).values('pk')
+        with transaction.atomic():
+            SearchCache.objects.filter(machine__in=changed_machines).delete()
+            self.create_search_cache(Fact.objects.filter(machine__in=changed_machines))
+
+    def create_search_cache(self, facts):
         # Build the fact cache
         items_to_be_inserted = []
-        SearchCache.objects.all().delete()
         if settings.SEARCH_FACTS != []:
             queries = []
             for f in settings.SEARCH_FACTS:
@@ -115,16 +183,15 @@ class Command(BaseCommand):
             for query in queries:
                 qs = qs | query
 
-            facts = Fact.objects.filter(qs)
+            facts = facts.filter(qs).values('machine_id', 'fact_data')
             for fact in facts.iterator():
                 # If someone ships a fact that is too long, we want to skip it
-                if len(fact.fact_data) <= 254:
-                    cached_item = SearchCache(machine=fact.machine, search_item=fact.fact_data)
+                if len(fact['fact_data']) <= 254:
+                    cached_item = SearchCache(
+                        machine_id=fact['machine_id'], search_item=fact['fact_data'])
                     items_to_be_inserted.append(cached_item)
                     if not server.utils.is_postgres():
                         cached_item.save()
 
         if server.utils.is_postgres() and items_to_be_inserted != []:
             SearchCache.objects.bulk_create(items_to_be_inserted)
-
-        gc.collect()
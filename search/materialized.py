@@ -0,0 +1,67 @@
+"""Stored results for materialized SavedSearches
+
+A SavedSearch marked `materialized` keeps its matching machine IDs in
+SavedSearchResult. The `refresh_saved_searches` command rebuilds them
+on a schedule, and reads rebuild them first if they are older than the
+`SAVED_SEARCH_MATERIALIZED_TTL` setting (in seconds) or the search's
+criteria have changed since.
+"""
+
+
+import datetime
+import hashlib
+
+import django.utils.timezone
+from django.db import transaction
+from django.db.models import Q
+
+import server.utils
+from search.compiler import search_query, search_rows
+from search.models import SavedSearch, SavedSearchResult
+from server.models import Machine
+
+
+def results_query(saved_search):
+    """Return a Q object filtering Machines to saved_search's stored results.
+
+    The results are refreshed first if they are stale, so
+    saved_search.materialized_at reports their age afterwards.
+    """
+    if is_stale(saved_search):
+        refresh(saved_search)
+    return Q(pk__in=SavedSearchResult.objects.filter(saved_search=saved_search).values('machine'))
+
+
+def is_stale(saved_search, key=None):
+    if saved_search.materialized_at is None:
+        return True
+    ttl = server.utils.get_django_setting('SAVED_SEARCH_MATERIALIZED_TTL', 3600)
+    expired = saved_search.materialized_at < django.utils.timezone.now() - datetime.timedelta(seconds=ttl)
+    return expired or saved_search.materialized_key != (key or criteria_key(saved_search))
+
+
+def criteria_key(saved_search):
+    return hashlib.sha1(repr(search_rows(saved_search)).encode()).hexdigest()
+
+
+def refresh(saved_search, force=False):
+    """Rebuild saved_search's stored results.
+
+    Concurrent refreshes of the same search are serialized on its row,
+    and a refresh that finds the results were rebuilt while it waited
+    does nothing unless `force` is set.
+    """
+    with transaction.atomic():
+        locked = SavedSearch.objects.select_for_update().get(pk=saved_search.pk)
+        key = criteria_key(locked)
+        if force or is_stale(locked, key):
+            SavedSearchResult.objects.filter(saved_search=locked).delete()
+            machine_ids = Machine.objects.filter(search_query(locked)).values_list('pk', flat=True)
+            SavedSearchResult.objects.bulk_create(
+                SavedSearchResult(saved_search=locked, machine_id=pk) for pk in machine_ids.iterator())
+            locked.materialized_at = django.utils.timezone.now()
+            locked.materialized_key = key
+            locked.save(update_fields=['materialized_at', 'materialized_key'])
+
+    saved_search.materialized_at = locked.materialized_at
+    saved_search.materialized_key = locked.materialized_key
@@ -0,0 +1,24 @@
+# Generated by Django 3.0.7 on 2026-10-19 08:36
+
+from django.db import migrations
+
+
+def clear_search_field_cache(apps, schema_editor):
+    """The cache is rebuilt by search_maintenance; drop any duplicates."""
+    SearchFieldCache = apps.get_model('search', 'SearchFieldCache')
+    SearchFieldCache.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0015_auto_20190228_1355'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_search_field_cache, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='searchfieldcache',
+            unique_together={('search_model', 'search_field')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.0.7 on 2026-10-19 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0094_auto_20190903_1507'),
+        ('search', '0016_searchfieldcache_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedsearch',
+            name='materialized',
+            field=models.BooleanField(default=False, help_text='Store the results and refresh them periodically rather than searching live.'),
+        ),
+        migrations.AddField(
+            model_name='savedsearch',
+            name='materialized_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='savedsearch',
+            name='materialized_key',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='SavedSearchResult',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='server.Machine')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='search.SavedSearch')),
+            ],
+            options={
+                'unique_together': {('saved_search', 'machine')},
+            },
+        ),
+    ]
@@ -19,6 +19,12 @@ class SavedSearch(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     save_search = models.BooleanField(default=False)
     created_by = models.ForeignKey(User, default=get_current_user, on_delete=models.CASCADE)
+    materialized = models.BooleanField(
+        default=False,
+        help_text='Store the results and refresh them periodically rather than searching live.')
+    materialized_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Fingerprint of the criteria the stored results were built from.
+    materialized_key = models.CharField(max_length=40, blank=True, editable=False)
 
     def __getattribute__(self, name):
         attr = models.Model.__getattribute__(self, name)
@@ -78,6 +84,15 @@ class SearchRow(models.Model):
         ordering = ['position']
 
 
+class SavedSearchResult(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE)
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = (('saved_search', 'machine'),)
+
+
 class SearchFieldCache(models.Model):
     SEARCH_MODEL_CHOICES = (
         ('Machine', 'Machine'),
@@ -94,6 +109,9 @@ class SearchFieldCache(models.Model):
     def __str__(self):
         return '%s: %s' % (self.search_model, self.search_field)
 
+    class Meta:
+        unique_together = (('search_model', 'search_field'),)
+
 
 class SearchCache(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -0,0 +1,261 @@
+"""Optional database search index for the quick search box
+
+The quick search matches a substring against most Machine fields and
+the machine's SearchCache items. Without help from the database that
+is a sequential scan of both tables for every search.
+
+When the `QUICK_SEARCH_INDEX` setting is enabled and the index has been
+built with `manage.py quick_search_index`, searches use:
+
+    Postgres: pg_trgm GIN indexes on the same `UPPER(column::text)`
+        expressions that Django's `icontains` lookups produce, so the
+        existing substring semantics are kept, with results ordered by
+        trigram similarity.
+    SQLite: FTS5 tables using the trigram tokenizer, kept in sync by
+        triggers, with exact and prefix matches ordered first.
+
+Other databases, queries too short to form a trigram, and databases
+where the index hasn't been built yet fall back to the plain `icontains`
+query. Whether the index exists is rechecked at most every
+`INDEX_CHECK_INTERVAL` seconds, and `search_values` falls back if
+another process drops the index in between.
+"""
+
+
+import time
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+import server.utils
+from search.models import SearchCache
+from server.models import Machine
+
+
+SKIP_FIELDS = {
+    'id',
+    'machine_group',
+    'deployed',
+    'broken_client',
+    'hd_percent',
+    'memory',
+    'memory_kb',
+    'hd_space',
+    'hd_total',
+    'cpu_type',
+    'cpu_speed',
+    'first_checkin',
+    'last_checkin'}
+SEARCH_FIELDS = [f.name for f in Machine._meta.fields if f.name not in SKIP_FIELDS]
+# Trigram indexes can't match anything shorter than a trigram.
+MIN_QUERY_LENGTH = 3
+
+MACHINE_TABLE = Machine._meta.db_table
+SEARCH_CACHE_TABLE = SearchCache._meta.db_table
+MACHINE_FTS_TABLE = f'{MACHINE_TABLE}_fts'
+SEARCH_CACHE_FTS_TABLE = f'{SEARCH_CACHE_TABLE}_fts'
+INDEX_CHECK_INTERVAL = 60
+
+# (whether the index exists, when that was checked)
+_index_built = (False, None)
+
+
+def index_enabled():
+    return (
+        server.utils.get_django_setting('QUICK_SEARCH_INDEX', False) and
+        connection.vendor in ('postgresql', 'sqlite') and
+        index_built())
+
+
+def index_built():
+    """Return whether the search index exists in the database."""
+    global _index_built
+    built, checked = _index_built
+    now = time.monotonic()
+    if checked is None or now - checked > INDEX_CHECK_INTERVAL:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COUNT(*) FROM pg_indexes WHERE indexname = %s',
+                    [f'{SEARCH_CACHE_TABLE}_search_item_trgm'])
+                built = cursor.fetchone()[0] > 0
+        else:
+            table_names = connection.introspection.table_names()
+            built = MACHINE_FTS_TABLE in table_names and SEARCH_CACHE_FTS_TABLE in table_names
+        _index_built = (built, now)
+    return built
+
+
+def reset_index_check():
+    global _index_built
+    _index_built = (False, None)
+
+
+def _uses_index(query_string):
+    return index_enabled() and len(query_string) >= MIN_QUERY_LENGTH
+
+
+def search(machines, query_string):
+    """Filter machines to those matching query_string.
+
+    Args:
+        machines (QuerySet of Machine): Machines the user may search.
+        query_string (str): Text to search for.
+
+    Returns:
+        QuerySet of Machines, ordered by relevance if the search index
+        was used.
+    """
+    if _uses_index(query_string):
+        if connection.vendor == 'postgresql':
+            return _postgres_search(machines, query_string)
+        return _sqlite_search(machines, query_string)
+
+    return machines.filter(_contains_q(query_string))
+
+
+def search_values(machines, query_string, fields):
+    """Return the values of fields for machines matching query_string.
+
+    Indexed searches are run here rather than left lazy, so that if the
+    index was dropped since `index_built` last checked, the plain query
+    can be used instead.
+
+    Returns:
+        List (or QuerySet, if the index wasn't used) of dicts.
+    """
+    if not _uses_index(query_string):
+        return search(machines, query_string).values(*fields)
+
+    global _index_built
+    try:
+        # A savepoint, so a failure doesn't break an open transaction.
+        with transaction.atomic():
+            return list(search(machines, query_string).values(*fields))
+    except DatabaseError:
+        _index_built = (False, time.monotonic())
+        return machines.filter(_contains_q(query_string)).values(*fields)
+
+
+def _contains_q(query_string):
+    queries = Q()
+    for field in SEARCH_FIELDS:
+        queries |= Q(**{f'{field}__icontains': query_string})
+    # A subquery rather than a join means no duplicate rows to DISTINCT
+    # away.
+    cache_matches = SearchCache.objects.filter(
+        search_item__icontains=query_string).values('machine')
+    return queries | Q(pk__in=cache_matches)
+
+
+def _postgres_search(machines, query_string):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # The icontains lookups are served by the trigram indexes.
+    similarities = [TrigramSimilarity(field, query_string) for field in SEARCH_FIELDS]
+    return (
+        machines
+        .filter(_contains_q(query_string))
+        .annotate(rank=Greatest(*similarities))
+        .order_by(F('rank').desc(nulls_last=True)))
+
+
+def _sqlite_search(machines, query_string):
+    # Search the whole string as a single FTS5 phrase.
+    match = '"{}"'.format(query_string.replace('"', '""'))
+    machine_matches = RawSQL(
+        f'SELECT rowid FROM {MACHINE_FTS_TABLE} WHERE {MACHINE_FTS_TABLE} MATCH %s', [match])
+    cache_matches = RawSQL(
+        f'SELECT machine_id FROM {SEARCH_CACHE_FTS_TABLE} '
+        f'WHERE {SEARCH_CACHE_FTS_TABLE} MATCH %s', [match])
+    return (
+        machines
+        .filter(Q(pk__in=machine_matches) | Q(pk__in=cache_matches))
+        .annotate(rank=_match_strength(query_string))
+        .order_by('rank'))
+
+
+def _match_strength(query_string):
+    """Rank exact, then prefix, then other matches on identifying fields.
+
+    FTS5's bm25 can only be read from the MATCH query itself, and
+    correlating it back to each machine row costs a full-text query
+    per result, so SQLite results are ranked by this instead.
+    """
+    whens = []
+    for lookup, rank in (('iexact', 0), ('istartswith', 1)):
+        for field in ('serial', 'hostname', 'console_user'):
+            whens.append(When(**{f'{field}__{lookup}': query_string, 'then': Value(rank)}))
+    return Case(*whens, default=Value(2), output_field=IntegerField())
+
+
+def create_index():
+    """Create (or recreate) the search index for the current database."""
+    drop_index()
+    with connection.cursor() as cursor:
+        for statement in _create_statements():
+            cursor.execute(statement)
+    reset_index_check()
+
+
+def drop_index():
+    with connection.cursor() as cursor:
+        for statement in _drop_statements():
+            cursor.execute(statement)
+    reset_index_check()
+
+
+def _create_statements():
+    if connection.vendor == 'postgresql':
+        statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
+        for table, field in _postgres_indexed_columns():
+            statements.append(
+                f'CREATE INDEX {table}_{field}_trgm ON {table} '
+                f'USING gin ((UPPER({field}::text)) gin_trgm_ops)')
+        return statements
+
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    statements = []
+    for fts_table, table, fts_columns, new, old in (
+            (MACHINE_FTS_TABLE, MACHINE_TABLE, columns, new_values, old_values),
+            (SEARCH_CACHE_FTS_TABLE, SEARCH_CACHE_TABLE, 'search_item, machine_id',
+             'new.search_item, new.machine_id', 'old.search_item, old.machine_id')):
+        unindexed = fts_columns.replace('machine_id', 'machine_id UNINDEXED')
+        statements.extend([
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5({unindexed}, content='{table}', "
+            f"content_rowid='id', tokenize='trigram')",
+            f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+            f'CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO {fts_table}(rowid, {fts_columns}) VALUES (new.id, {new}); END',
+            f'CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN '
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {fts_columns}) "
+            f"VALUES ('delete', old.id, {old}); END",
+            f'CREATE TRIGGER {fts_table}_au AFTER UPDATE ON {table} BEGIN '
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {fts_columns}) "
+            f"VALUES ('delete', old.id, {old}); "
+            f'INSERT INTO {fts_table}(rowid, {fts_columns}) VALUES (new.id, {new}); END'])
+    return statements
+
+
+def _drop_statements():
+    if connection.vendor == 'postgresql':
+        return [
+            f'DROP INDEX IF EXISTS {table}_{field}_trgm'
+            for table, field in _postgres_indexed_columns()]
+
+    statements = []
+    for fts_table in (MACHINE_FTS_TABLE, SEARCH_CACHE_FTS_TABLE):
+        statements.extend(
+            f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au'))
+        statements.append(f'DROP TABLE IF EXISTS {fts_table}')
+    return statements
+
+
+def _postgres_indexed_columns():
+    columns = [(MACHINE_TABLE, field) for field in SEARCH_FIELDS]
+    columns.append((SEARCH_CACHE_TABLE, 'search_item'))
+    return columns
@@ -0,0 +1,59 @@
+"""Tests for compiling saved searches."""
+
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from search.models import SavedSearch, SearchGroup, SearchRow
+from search.views import search_machines
+from server.models import Fact, Machine
+
+
+class SearchCompilerTest(TestCase):
+    """Test saved searches built from multiple groups and rows."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        self.machine = Machine.objects.get(serial='C0DEADBEEF')
+        for name, data in (('os', 'Darwin'), ('role', 'build'), ('role', 'test')):
+            Fact.objects.create(machine=self.machine, fact_name=name, fact_data=data)
+        user = User.objects.create(username='searcher')
+        self.search = SavedSearch.objects.create(created_by=user)
+
+    def add_group(self, and_or='AND'):
+        position = self.search.searchgroup_set.count()
+        return SearchGroup.objects.create(saved_search=self.search, and_or=and_or, position=position)
+
+    def add_row(self, group, model, field, operator, term, and_or='AND'):
+        SearchRow.objects.create(
+            search_group=group, search_models=model, search_field=field, operator=operator,
+            search_term=term, and_or=and_or, position=group.searchrow_set.count())
+
+    def run_search(self):
+        return sorted(search_machines(self.search.pk, Machine.objects.all(), full=True).values_list(
+            'serial', flat=True))
+
+    def test_rows_on_same_relation_do_not_duplicate(self):
+        """Ensure machines matching several fact rows are returned once."""
+        group = self.add_group()
+        self.add_row(group, 'Facter', 'os', '=', 'Darwin')
+        self.add_row(group, 'Facter', 'role', 'Contains', 'b')
+        self.add_row(group, 'Facter', 'role', 'Contains', 't', and_or='OR')
+        self.assertEqual(self.run_search(), ['C0DEADBEEF'])
+
+    def test_negated_row(self):
+        """Ensure `!=` rows exclude machines with a matching fact."""
+        group = self.add_group()
+        self.add_row(group, 'Facter', 'role', '!=', 'build')
+        self.assertEqual(self.run_search(), ['C1DEADBEEF'])
+
+    def test_group_operators(self):
+        """Ensure groups are combined with their own operator."""
+        self.add_row(self.add_group(), 'Machine', 'serial', '=', 'C1DEADBEEF')
+        self.add_row(self.add_group(and_or='OR'), 'Facter', 'os', '=', 'Darwin')
+        self.assertEqual(self.run_search(), ['C0DEADBEEF', 'C1DEADBEEF'])
+
+        self.search.searchgroup_set.filter(position=1).update(and_or='AND')
+        self.assertEqual(self.run_search(), [])
@@ -0,0 +1,57 @@
+"""Tests for materialized saved searches."""
+
+
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from search.models import SavedSearch, SearchGroup, SearchRow
+from search.views import search_machines
+from server.models import Machine
+
+
+class MaterializedSearchTest(TestCase):
+    """Test stored results are used, and refreshed when stale."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        user = User.objects.create(username='searcher')
+        self.search = SavedSearch.objects.create(created_by=user, materialized=True)
+        group = SearchGroup.objects.create(saved_search=self.search)
+        self.row = SearchRow.objects.create(
+            search_group=group, search_models='Machine', search_field='hostname',
+            operator='=', search_term='mla680', position=0)
+
+    def run_search(self):
+        return sorted(search_machines(self.search.pk, Machine.objects.all(), full=True).values_list(
+            'serial', flat=True))
+
+    def test_stored_results_are_used(self):
+        """Ensure changes aren't seen until the results are refreshed."""
+        self.assertEqual(self.run_search(), ['C0DEADBEEF'])
+        self.search.refresh_from_db()
+        self.assertIsNotNone(self.search.materialized_at)
+
+        Machine.objects.filter(serial='C1DEADBEEF').update(hostname='mla680')
+        self.assertEqual(self.run_search(), ['C0DEADBEEF'])
+
+        call_command('refresh_saved_searches', '--force', stdout=io.StringIO())
+        self.assertEqual(self.run_search(), ['C0DEADBEEF', 'C1DEADBEEF'])
+
+    def test_expired_results_are_refreshed(self):
+        """Ensure results older than the TTL are recomputed on read."""
+        self.run_search()
+        Machine.objects.filter(serial='C1DEADBEEF').update(hostname='mla680')
+        with override_settings(SAVED_SEARCH_MATERIALIZED_TTL=0):
+            self.assertEqual(self.run_search(), ['C0DEADBEEF', 'C1DEADBEEF'])
+
+    def test_criteria_change_refreshes(self):
+        """Ensure editing the search invalidates its stored results."""
+        self.run_search()
+        self.row.search_term = 'mla806'
+        self.row.save()
+        self.assertEqual(self.run_search(), ['C1DEADBEEF'])
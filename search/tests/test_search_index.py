@@ -0,0 +1,82 @@
+"""Tests for the quick search index."""
+
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from search import search_index
+from search.models import SearchCache
+from search.views import quick_search
+from server.models import Machine
+
+
+class QuickSearchIndexTest(TestCase):
+    """Test that the indexed quick search matches the plain one."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        self.machine = Machine.objects.get(serial='C0DEADBEEF')
+        search_index.create_index()
+        self.addCleanup(search_index.drop_index)
+
+    def search(self, query_string):
+        return sorted(row['serial'] for row in quick_search(Machine.objects.all(), query_string))
+
+    def assertSameResults(self, query_string):
+        with override_settings(QUICK_SEARCH_INDEX=False):
+            expected = self.search(query_string)
+        with override_settings(QUICK_SEARCH_INDEX=True):
+            self.assertEqual(self.search(query_string), expected)
+        return expected
+
+    def test_substring_match(self):
+        """Ensure the index finds substrings, ignoring case."""
+        self.assertEqual(self.assertSameResults('0deadbe'), ['C0DEADBEEF'])
+
+    def test_index_follows_updates(self):
+        """Ensure changes made after the index was built are searchable."""
+        self.machine.hostname = 'renamed-host'
+        self.machine.save()
+        self.assertEqual(self.assertSameResults('renamed'), ['C0DEADBEEF'])
+
+    def test_search_cache_match(self):
+        """Ensure cached fact values are searched."""
+        SearchCache.objects.create(machine=self.machine, search_item='asset-tag-1234')
+        self.assertEqual(self.assertSameResults('tag-12'), ['C0DEADBEEF'])
+
+    def test_short_query_falls_back(self):
+        """Ensure queries shorter than a trigram still match."""
+        self.assertIn('C0DEADBEEF', self.assertSameResults('C0'))
+
+
+class QuickSearchNoIndexTest(TestCase):
+    """Test that an enabled but unbuilt index falls back to icontains."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        search_index.drop_index()
+
+    @override_settings(QUICK_SEARCH_INDEX=True)
+    def test_missing_index_falls_back(self):
+        self.assertFalse(search_index.index_enabled())
+        results = quick_search(Machine.objects.all(), '0deadbe')
+        self.assertEqual([row['serial'] for row in results], ['C0DEADBEEF'])
+
+    @override_settings(QUICK_SEARCH_INDEX=True)
+    def test_index_dropped_elsewhere_falls_back(self):
+        """Ensure a drop by another process, before the recheck, falls back."""
+        search_index.create_index()
+        self.assertTrue(search_index.index_enabled())
+        # Drop the tables without resetting this process's check.
+        with connection.cursor() as cursor:
+            for statement in search_index._drop_statements():
+                cursor.execute(statement)
+        self.assertTrue(search_index.index_enabled())
+
+        results = quick_search(Machine.objects.all(), '0deadbe')
+        self.assertEqual([row['serial'] for row in results], ['C0DEADBEEF'])
+        self.assertFalse(search_index.index_enabled())
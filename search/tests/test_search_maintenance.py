@@ -0,0 +1,53 @@
+"""Tests for the search_maintenance command."""
+
+
+import datetime
+import io
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+import server.utils
+from search.models import SearchCache, SearchFieldCache
+from server.models import Fact, Machine
+
+
+@override_settings(SEARCH_FACTS=['test_fact'])
+class SearchMaintenanceTest(TestCase):
+    """Test full and incremental search cache maintenance."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        self.machine = Machine.objects.get(serial='C0DEADBEEF')
+        Fact.objects.create(machine=self.machine, fact_name='old_fact', fact_data='old')
+        call_command('search_maintenance', stdout=io.StringIO())
+
+    def test_full_rebuild(self):
+        """Ensure the first run builds the field cache from scratch."""
+        self.assertTrue(
+            SearchFieldCache.objects.filter(search_model='Facter', search_field='old_fact').exists())
+        self.assertIsNotNone(server.utils.get_setting('search_maintenance_last_full_run'))
+
+    def test_incremental_adds_changed_machine_data(self):
+        """Ensure incremental runs pick up new fields from recent checkins."""
+        Machine.objects.filter(pk=self.machine.pk).update(last_checkin=now())
+        Fact.objects.create(machine=self.machine, fact_name='test_fact', fact_data='findme')
+
+        call_command('search_maintenance', stdout=io.StringIO())
+        self.assertTrue(
+            SearchFieldCache.objects.filter(search_model='Facter', search_field='test_fact').exists())
+        self.assertEqual(
+            list(SearchCache.objects.values_list('search_item', flat=True)), ['findme'])
+
+    def test_incremental_skips_unchanged_machines(self):
+        """Ensure machines that haven't checked in aren't reprocessed."""
+        stale = now() - datetime.timedelta(days=1)
+        Machine.objects.filter(pk=self.machine.pk).update(last_checkin=stale)
+        Fact.objects.create(machine=self.machine, fact_name='unseen_fact', fact_data='')
+
+        call_command('search_maintenance', stdout=io.StringIO())
+        self.assertFalse(SearchFieldCache.objects.filter(search_field='unseen_fact').exists())
+        self.assertTrue(SearchFieldCache.objects.filter(search_field='old_fact').exists())
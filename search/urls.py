@@ -17,6 +17,7 @@ urlpatterns = [
     path('new_search_row/<int:search_group_id>/', views.new_search_row, name='search_row_new'),
     path('edit_search_row/<int:search_row_id>/', views.edit_search_row, name='search_row_edit'),
     path('run_search/<int:search_id>/', views.run_search, name='search_run'),
+    path('explain_search/<int:search_id>/', views.explain_search, name='search_explain'),
     path('save_search/<int:search_id>/', views.save_search, name='search_save'),
     path('csv/<int:search_id>/', views.export_csv, name='search_export_csv'),
     path('get_fields/<model>/', views.get_fields, name='search_get_fields'), ]
@@ -2,12 +2,16 @@ import json
 import re
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import CharField, Q
-from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import CharField
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.context_processors import csrf
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
+import search.compiler
+import search.materialized
+import search.search_index
 import search.utils
 import server.utils
 import utils.csv
@@ -46,37 +50,8 @@ def index(request):
 
 
 def quick_search(machines, query_string):
-    skip_fields = [
-        'id',
-        'machine_group',
-        'deployed',
-        'broken_client',
-        'hd_percent',
-        'memory',
-        'memory_kb',
-        'hd_space',
-        'hd_total',
-        'cpu_type',
-        'cpu_speed',
-        'first_checkin',
-        'last_checkin'
-    ]
-
-    fields = []
-    for f in Machine._meta.fields:
-        if f.name not in skip_fields:
-            fields.append(f)
-
-    queries = [Q(**{"%s__icontains" % f.name: query_string}) for f in fields]
-
-    query = {'searchcache__search_item__icontains': query_string}
-    queries.append(Q(**query))
-    qs = Q()
-    for query in queries:
-        qs = qs | query
-
-    return machines.filter(qs).\
-        values('id', 'serial', 'hostname', 'console_user', 'last_checkin').distinct()
+    return search.search_index.search_values(
+        machines, query_string, ('id', 'serial', 'hostname', 'console_user', 'last_checkin'))
 
 # All saved searches
 
@@ -98,163 +73,12 @@ def list_view(request):
 
 def search_machines(search_id, machines, full=False):
     saved_search = get_object_or_404(SavedSearch, pk=search_id)
-    search_groups = saved_search.searchgroup_set.all()
-    queries = Q()
-    search_group_counter = 0
-    for search_group in search_groups:
-        if search_group_counter != 0:
-            group_operator = search_group.and_or
-        else:
-            group_operator = None
-
-        search_row_counter = 0
-        row_queries = Q()
-        for search_row in search_group.searchrow_set.all():
-            if search_row_counter != 0:
-                row_operator = search_row.and_or
-            else:
-                row_operator = None
-            search_row_counter = search_row_counter + 1
-            # Get the operator
-            operators = {
-                'Contains': '__icontains',
-                '=': '__exact',
-                '!=': '',  # We negate this later on
-                '<': '__lt',
-                '<=': '__lte',
-                '>': '__gt',
-                '>=': '__gte',
-            }
-            for display_operator, actual_operator in operators.items():
-                if search_row.operator == display_operator:
-                    operator = actual_operator
-                    break
-            # Get the model & field
-            model = None
-            if search_row.search_models == 'Machine':
-                model = Machine
-                querystring = {
-                    '%s%s' % (search_row.search_field, operator): search_row.search_term
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-                else:
-                    q_object = ~Q(**querystring)
-            elif search_row.search_models == 'Facter':
-                model = Fact
-                querystring = {
-                    'facts__fact_name': search_row.search_field,
-                    'facts__fact_data%s' % (operator): search_row.search_term
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-                else:
-                    q_object = ~Q(**querystring)
-
-            elif search_row.search_models == 'Application Inventory':
-                model = Application
-                if search_row.search_field == 'Name':
-                    search_field = 'name'
-                elif search_row.search_field == 'Bundle ID':
-                    search_field = 'bundleid'
-                elif search_row.search_field == 'Path':
-                    search_field = 'path'
-                elif search_row.search_field == 'Bundle Name':
-                    search_field = 'bundlename'
-                querystring = {
-                    'inventoryitem__application__%s%s' % (search_field, operator): search_row.search_term  # noqa: E501
-                }
-
-                if operator != '':
-                    q_object = Q(**querystring)
-                else:
-                    q_object = ~Q(**querystring)
-
-            elif search_row.search_models == 'External Script':
-                # It must be an exernal thingie if we're here
-                model = PluginScriptRow
-                # get the name of the plugin and row
-                plugin_name, row = search_row.search_field.split('=>')
-                submission_and_script_name = '%s: %s' % (plugin_name, row)
-                querystring = {
-
-                    'pluginscriptsubmission__pluginscriptrow__submission_and_script_name': submission_and_script_name,  # noqa: E501
-                    'pluginscriptsubmission__pluginscriptrow__pluginscript_data%s' % (operator): search_row.search_term  # noqa: E501
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-
-                else:
-                    q_object = ~Q(**querystring)
-
-            elif search_row.search_models == 'Application Version':
-
-                model = InventoryItem  # noqa: F841
-                app_name, bundleid = search_row.search_field.split('=>')
-                querystring = {
-                    'inventoryitem__application__name': app_name,
-                    'inventoryitem__application__bundleid': bundleid,
-                    'inventoryitem__version%s' % (operator): search_row.search_term
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-
-                else:
-                    q_object = ~Q(**querystring)
-
-            elif search_row.search_models == 'Profile':
-
-                model = Profile  # noqa: F841
-                querystring = {
-                    'profile__%s%s' % (search_row.search_field, operator): search_row.search_term
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-
-                else:
-                    q_object = ~Q(**querystring)
-
-            elif search_row.search_models == 'Profile Payload':
-
-                model = Payload  # noqa: F841
-                querystring = {
-                    'profile__payload__%s%s' % (search_row.search_field, operator):
-                    search_row.search_term
-                }
-                if operator != '':
-                    q_object = Q(**querystring)
-
-                else:
-                    q_object = ~Q(**querystring)
-
-            # Add a row operator if needed
-            if row_operator is not None:
-                if row_operator == 'AND':
-                    row_queries.add(q_object, Q.AND)
-
-                elif row_operator == 'OR':
-                    row_queries.add(q_object, Q.OR)
-            else:
-                # Add to row_queries
-                # row_queries.add(q_object, Q.AND)
-                row_queries = q_object
-
-        if group_operator is not None:
-            if group_operator == 'AND':
-                queries.add(row_queries, Q.AND)
-            elif group_operator == 'OR':
-                queries.add(row_queries, Q.OR)
-        else:
-
-            queries = row_queries
-
-        search_group_counter = search_group_counter + 1
-
-    if full:
-        machines = machines.filter(queries).distinct()
+    if saved_search.materialized:
+        machines = machines.filter(search.materialized.results_query(saved_search))
     else:
-        machines = machines.filter(queries).values(
-            'id', 'serial', 'hostname', 'console_user', 'last_checkin').distinct()
+        machines = machines.filter(search.compiler.search_query(saved_search))
+    if not full:
+        machines = machines.values('id', 'serial', 'hostname', 'console_user', 'last_checkin')
     return machines
 
 # Show search
@@ -277,6 +101,14 @@ def run_search(request, search_id):
          'page_length': page_length}
     return render(request, 'search/search_machines.html', c)
 
+
+@login_required
+@ga_required
+def explain_search(request, search_id):
+    """Show the database's query plan for a saved search."""
+    machines = search_machines(search_id, Machine.objects.all(), full=True)
+    return HttpResponse(machines.explain(), content_type='text/plain')
+
 # New search
 
 
@@ -548,5 +380,9 @@ def export_csv(request, search_id):
         machines = machines.filter(
             machine_group__business_unit__id__in=request.user.businessunit_set.values('id'))
     machines = search_machines(search_id, machines, full=True)
-    title = get_object_or_404(SavedSearch, pk=search_id).name
-    return utils.csv.get_csv_response(machines, utils.csv.machine_fields(), title)
+    saved_search = get_object_or_404(SavedSearch, pk=search_id)
+    response = utils.csv.get_csv_response(
+        machines, utils.csv.machine_fields(), saved_search.name, request)
+    if saved_search.materialized:
+        response['Last-Modified'] = http_date(saved_search.materialized_at.timestamp())
+    return response
@@ -0,0 +1,132 @@
+"""Friendly model name lookups
+
+Apple's product lookup maps the last three (older models) or four
+characters of a serial number, the serial stub, to a marketing name. Many
+machines share a stub, so `resolve` looks each unique stub up once,
+through one pooled session with at most `workers` requests in flight, and
+remembers the answer in FriendlyNameCache.
+
+Answers without a name are cached too, with a `retry_after` of
+`FRIENDLY_NAME_RETRY_AFTER` seconds (default one week). Lookups that
+couldn't reach the server, or got an error status back, are retried after
+`FRIENDLY_NAME_TRANSPORT_RETRY_AFTER` seconds (default one hour) instead.
+The lookup URL can be changed with the `FRIENDLY_NAME_LOOKUP_URL` setting.
+"""
+
+
+import concurrent.futures
+import datetime
+import xml.etree.ElementTree as ET
+
+import django.utils.timezone
+from django.db import transaction
+
+import server.utils
+from server.models import FriendlyNameCache
+
+
+DEFAULT_LOOKUP_URL = 'http://support-sp.apple.com/sp/product'
+DEFAULT_RETRY_AFTER = 7 * 86400
+DEFAULT_TRANSPORT_RETRY_AFTER = 3600
+DEFAULT_WORKERS = 4
+LOOKUP_TIMEOUT = 10
+
+
+def serial_stub(serial):
+    """Return the part of a serial number that identifies its model.
+
+    Returns:
+        (str) The serial stub, or None for virtual machines.
+    """
+    if not serial or serial.startswith('VM'):
+        return None
+    # older models product code is the last three characters of the serial
+    return serial[-4:] if len(serial) > 11 else serial[-3:]
+
+
+def resolve(stubs, workers=DEFAULT_WORKERS):
+    """Return friendly names for serial stubs, looking up uncached ones.
+
+    Args:
+        stubs (iterable of str): Serial stubs to resolve.
+        workers (int): Most lookups to have in flight at once.
+
+    Returns:
+        Dict of serial stub to friendly name. Stubs that couldn't be
+        resolved, or that failed recently, are left out.
+    """
+    stubs = set(stubs)
+    now = django.utils.timezone.now()
+    names = {}
+    waiting = set()
+    for entry in FriendlyNameCache.objects.filter(serial_stub__in=stubs):
+        if entry.friendly_name:
+            names[entry.serial_stub] = entry.friendly_name
+        elif entry.retry_after and entry.retry_after > now:
+            waiting.add(entry.serial_stub)
+
+    to_fetch = sorted(stubs - set(names) - waiting)
+    if not to_fetch:
+        return names
+
+    fetched = fetch(to_fetch, workers)
+    no_name_retry = now + datetime.timedelta(
+        seconds=server.utils.get_django_setting('FRIENDLY_NAME_RETRY_AFTER', DEFAULT_RETRY_AFTER))
+    transport_retry = now + datetime.timedelta(
+        seconds=server.utils.get_django_setting(
+            'FRIENDLY_NAME_TRANSPORT_RETRY_AFTER', DEFAULT_TRANSPORT_RETRY_AFTER))
+    entries = []
+    for stub in to_fetch:
+        if stub not in fetched:
+            retry_after = transport_retry
+        elif not fetched[stub]:
+            retry_after = no_name_retry
+        else:
+            retry_after = None
+        entries.append(
+            FriendlyNameCache(serial_stub=stub, friendly_name=fetched.get(stub, ''), retry_after=retry_after))
+    with transaction.atomic():
+        # Anything cached for these stubs is an expired failure.
+        FriendlyNameCache.objects.filter(serial_stub__in=to_fetch).delete()
+        FriendlyNameCache.objects.bulk_create(entries)
+
+    names.update((stub, name) for stub, name in fetched.items() if name)
+    return names
+
+
+def fetch(stubs, workers=DEFAULT_WORKERS):
+    """Look serial stubs up concurrently, bypassing the cache.
+
+    Returns:
+        Dict of serial stub to friendly name, for the stubs the server
+        answered; the name is '' if the answer didn't have one.
+    """
+    # Only needed by the friendly_model_name command; don't load it with
+    # every process.
+    import requests
+
+    workers = max(workers, 1)
+    url = server.utils.get_django_setting('FRIENDLY_NAME_LOOKUP_URL', DEFAULT_LOOKUP_URL)
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda stub: fetch_one(session, url, stub), stubs)
+            return {stub: name for stub, name in zip(stubs, results) if name is not None}
+
+
+def fetch_one(session, url, stub):
+    """Return stub's friendly name, '' if there isn't one, or None if the
+    server couldn't be asked."""
+    import requests
+
+    try:
+        response = session.get(url, params={'cc': stub}, timeout=LOOKUP_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return None
+    try:
+        return ET.fromstring(response.text).find('configCode').text or ''
+    except (ET.ParseError, AttributeError):
+        return ''
@@ -0,0 +1,90 @@
+'''Times cold starts of a web worker and a management command'''
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+SCENARIOS = {
+    # What a gunicorn worker imports before it can serve its first
+    # request, including every view module the URLconf pulls in.
+    'worker': (
+        'import sal.wsgi\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns'),
+    'command': (
+        'import django\n'
+        'django.setup()\n'
+        'import server.management.commands.server_maintenance'),
+}
+FIRST_PARTY = {
+    'api', 'catalog', 'inventory', 'licenses', 'profiles', 'sal', 'search', 'server', 'utils'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Times cold starts of a web worker and of a management command in fresh interpreters, '
+        'and lists the slowest imports reported by `python -X importtime`.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f"Scenarios to time, from {', '.join(SCENARIOS)}. Defaults to all of them.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10, help='Number of imports to list.')
+        parser.add_argument(
+            '--target', type=float, default=1.0,
+            help='Boot time, in seconds, that each scenario should stay under.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'sal.settings')
+        for scenario in options['scenarios'] or SCENARIOS:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, '-X', 'importtime', '-c', SCENARIOS[scenario]],
+                    cwd=settings.PROJECT_DIR, env=env, capture_output=True, text=True)
+                timings.append(time.perf_counter() - start)
+                if result.returncode:
+                    raise CommandError(f'{scenario} failed:\n{result.stderr[-2000:]}')
+
+            median = statistics.median(timings)
+            verdict = 'within' if median <= options['target'] else 'OVER'
+            self.stdout.write(
+                f'{scenario}: median {median:.3f}s over {len(timings)} runs '
+                f"({verdict} the {options['target']:.2f}s target)")
+
+            imports = parse_importtime(result.stderr)
+            first_party = [i for i in imports if i[0].split('.')[0] in FIRST_PARTY]
+            third_party = [i for i in imports if i[2] == 0 and i[0].split('.')[0] not in FIRST_PARTY]
+            for title, rows in (('first-party', first_party), ('top-level third-party', third_party)):
+                self.stdout.write(f'  slowest {title} imports (cumulative ms):')
+                for name, cumulative, _ in sorted(rows, key=lambda i: -i[1])[:options['top']]:
+                    self.stdout.write(f'    {cumulative / 1000:>8.1f}  {name}')
+
+
+def parse_importtime(output):
+    """Return (module, cumulative microseconds, nesting level) tuples."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            # The header row.
+            continue
+        module = name.strip()
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((module, int(cumulative), level))
+    return imports
@@ -1,15 +1,25 @@
 """Retrieves the friendly model name for machines that don't have one yet."""
 
-from django.core.management.base import BaseCommand, CommandError
+import collections
+
+from django.core.management.base import BaseCommand
 from django.db.models import Q
 
-import server.utils as utils
+from server import friendly_names
 from server.models import Machine
 
 
+UPDATE_BATCH_SIZE = 500
+
+
 class Command(BaseCommand):
     help = 'Retrieves friendly model names for machines without one'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=friendly_names.DEFAULT_WORKERS,
+            help='Number of lookups to run at once.')
+
     def handle(self, *args, **options):
         # Get all the machines without a friendly model name and have a model
         no_friendly = (
@@ -18,7 +28,21 @@ class Command(BaseCommand):
             .exclude(machine_model__isnull=True)
             .exclude(machine_model='')
             .filter(os_family='Darwin'))
-        for machine in no_friendly[:100]:
-            print(f'Processing {machine}')
-            machine.machine_model_friendly = utils.friendly_machine_model(machine)
-            machine.save()
+
+        machines_by_stub = collections.defaultdict(list)
+        for pk, serial in no_friendly.values_list('pk', 'serial').iterator():
+            stub = friendly_names.serial_stub(serial)
+            if stub:
+                machines_by_stub[stub].append(pk)
+
+        names = friendly_names.resolve(machines_by_stub, workers=options['workers'])
+        updated = 0
+        for stub, name in names.items():
+            pks = machines_by_stub[stub]
+            for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+                updated += Machine.objects.filter(
+                    pk__in=pks[start:start + UPDATE_BATCH_SIZE]).update(machine_model_friendly=name)
+
+        self.stdout.write(
+            f'Resolved {len(names)} of {len(machines_by_stub)} serial stubs; '
+            f'updated {updated} machines.')
@@ -0,0 +1,55 @@
+"""Creates upcoming monthly history partitions and drops expired ones."""
+
+
+import datetime
+from time import sleep
+
+from django.core.management.base import BaseCommand, CommandError
+import django.utils.timezone
+
+import server.utils
+from server import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates upcoming monthly partitions for history tables and drops those past the '
+        'retention limit (Postgres, with PARTITION_HISTORY_TABLES enabled)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Number of future months to keep partitions created for.')
+        parser.add_argument(
+            '--convert', action='store_true',
+            help=('Convert unpartitioned history tables into partitioned tables. This locks '
+                  'the tables while their rows are copied.'))
+
+    def handle(self, *args, **options):
+        sleep(options['sleep_time'])
+
+        if not partitions.partitioning_enabled():
+            if options['convert']:
+                raise CommandError(
+                    'Partitioning requires Postgres and the PARTITION_HISTORY_TABLES setting.')
+            return
+
+        historical_days = server.utils.get_setting('historical_retention')
+        datelimit = django.utils.timezone.now() - datetime.timedelta(days=historical_days)
+        months_ahead = options['months_ahead']
+
+        for model in partitions.PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if not partitions.is_partitioned(model):
+                if not options['convert']:
+                    self.stderr.write(
+                        f'{table} is not partitioned; run with --convert to partition it.')
+                    continue
+                partitions.convert_to_partitioned(model, datelimit.date(), months_ahead)
+                self.stdout.write(f'Converted {table} to a partitioned table.')
+
+            for name in partitions.create_partitions(model, months_ahead):
+                self.stdout.write(f'Created partition {name}.')
+            for name in partitions.drop_expired_partitions(model, datelimit):
+                self.stdout.write(f'Dropped expired partition {name}.')
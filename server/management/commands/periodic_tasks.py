@@ -0,0 +1,42 @@
+"""Runs Sal's outbound telemetry report and release version check"""
+
+
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+import server.utils
+
+
+def send_report():
+    # If the setting is None, it hasn't been configured yet; assume True.
+    if server.utils.get_setting('send_data') in (None, True):
+        server.utils.send_report()
+
+
+# name: task. Each task throttles itself, so the command can run as
+# often as the other maintenance commands do.
+TASKS = {
+    'send_report': send_report,
+    'version_check': server.utils.refresh_current_release_version,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs Sal's outbound telemetry report and release version check, so that checkins and "
+        'page views only read their cached results')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+
+    def handle(self, *args, **options):
+        sleep_time = options['sleep_time']
+        sleep(sleep_time)
+
+        for name, task in TASKS.items():
+            try:
+                task()
+            except Exception as e:
+                # If the report server is down, still run the other tasks.
+                self.stderr.write(f'{name} failed: {e}')
@@ -3,15 +3,21 @@
 
 import datetime
 import gc
+import time
 from time import sleep
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db.models import Exists, OuterRef
 import django.utils.timezone
 
 import server.utils
-from server.models import (PluginScriptSubmission, HistoricalFact, Machine, ManagedItemHistory,
-                           ManagementSource)
+from inventory import install_counts
+from server.models import (PluginScriptSubmission, HistoricalFact, Machine, ManagedItem,
+                           ManagedItemHistory, ManagementSource, Fact, Message)
+
+
+DEFAULT_BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
@@ -20,30 +26,44 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('sleep_time', type=int, nargs='?', default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows to delete per statement.')
+        parser.add_argument(
+            '--batch-sleep', type=float, default=0,
+            help='Seconds to pause between delete batches.')
+        parser.add_argument(
+            '--time-limit', type=int, default=0,
+            help=('Stop pruning after this many seconds; remaining rows are pruned on the next '
+                  'run. Defaults to 0 (no limit).'))
 
     def handle(self, *args, **options):
 
         sleep_time = options['sleep_time']
         sleep(sleep_time)
 
+        self.verbosity = options['verbosity']
+        self.batch_size = max(options['batch_size'], 1)
+        self.batch_sleep = options['batch_sleep']
+        time_limit = options['time_limit']
+        self.deadline = time.monotonic() + time_limit if time_limit > 0 else None
+
         historical_days = server.utils.get_setting('historical_retention')
         datelimit = django.utils.timezone.now() - datetime.timedelta(days=historical_days)
 
-        # Clear out too-old plugin script submissions.
-        PluginScriptSubmission.objects.filter(recorded__lt=datelimit).delete()
-
-        # Clear out-of-date ManagedItemHistories
-        ManagedItemHistory.objects.filter(recorded__lt=datelimit).delete()
-
-        for source in ManagementSource.objects.exclude(name__in=('Machine', 'Sal')):
-            if (not source.manageditem_set.count()
-                    and not source.manageditemhistory_set.count()  # noqa
-                    and not source.facts.count()  # noqa
-                    and not source.historical_facts.count()  # noqa
-                    and not source.messages.count()):  # noqa
-                source.delete()
-
-        HistoricalFact.objects.filter(fact_recorded__lt=datelimit).delete()
+        # Clear out too-old plugin script submissions (and their rows).
+        # Clear out-of-date ManagedItemHistories and HistoricalFacts.
+        expired = (
+            PluginScriptSubmission.objects.filter(recorded__lt=datelimit),
+            ManagedItemHistory.objects.filter(recorded__lt=datelimit),
+            HistoricalFact.objects.filter(fact_recorded__lt=datelimit))
+        for queryset in expired:
+            if not self.delete_in_batches(queryset):
+                self.stdout.write(
+                    'Time limit reached; remaining expired rows will be pruned on the next run.')
+                break
+        else:
+            self.delete_orphaned_sources()
 
         try:
             inactive_undeploy = int(settings.INACTIVE_UNDEPLOYED)
@@ -51,9 +71,61 @@ class Command(BaseCommand):
             if inactive_undeploy > 0:
                 now = django.utils.timezone.now()
                 inactive_days = now - datetime.timedelta(days=inactive_undeploy)
-                Machine.deployed_objects.filter(
-                    last_checkin__lte=inactive_days).update(deployed=False)
+                install_counts.undeploy(
+                    Machine.deployed_objects.filter(last_checkin__lte=inactive_days))
         except Exception:
             pass
 
         gc.collect()
+
+    def delete_in_batches(self, queryset):
+        """Delete queryset's rows in primary key ordered batches.
+
+        Each batch is its own short DELETE statement, so locks are held
+        briefly and other writers can interleave between batches.
+
+        Args:
+            queryset (QuerySet): Rows to delete.
+
+        Returns:
+            bool: True if every row was deleted, False if the time limit
+                was reached first.
+        """
+        model = queryset.model
+        name = model._meta.verbose_name_plural
+        pks = queryset.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        while True:
+            if self.out_of_time():
+                return False
+
+            batch = list(pks[:self.batch_size])
+            if not batch:
+                break
+
+            model.objects.filter(pk__in=batch).delete()
+            total += len(batch)
+            if self.verbosity > 1:
+                self.stdout.write(f'Deleted {total} expired {name}...')
+
+            if len(batch) < self.batch_size:
+                break
+
+            if self.batch_sleep:
+                sleep(self.batch_sleep)
+
+        if self.verbosity > 0 and total:
+            self.stdout.write(f'Deleted {total} expired {name}.')
+        return True
+
+    def delete_orphaned_sources(self):
+        """Remove ManagementSources that no longer have any data."""
+        related_models = (ManagedItem, ManagedItemHistory, Fact, HistoricalFact, Message)
+        orphans = ManagementSource.objects.exclude(name__in=('Machine', 'Sal'))
+        for model in related_models:
+            orphans = orphans.filter(
+                ~Exists(model.objects.filter(management_source=OuterRef('pk'))))
+        orphans.delete()
+
+    def out_of_time(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0094_auto_20190903_1507'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendlynamecache',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='friendlynamecache',
+            name='serial_stub',
+            field=models.CharField(db_index=True, max_length=5),
+        ),
+    ]
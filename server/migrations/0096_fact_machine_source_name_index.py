@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0095_friendlynamecache_retry_after'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fact',
+            index=models.Index(fields=['machine', 'management_source', 'fact_name'], name='server_fact_machine_source'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 import plistlib
 import random
 import string
+import uuid
 from datetime import datetime
 from xml.parsers.expat import ExpatError
 
@@ -9,7 +10,8 @@ from dateutil.parser import parse
 from ulid2 import generate_ulid_as_uuid
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils import timezone
 
 from utils import text_utils
@@ -22,6 +24,10 @@ OS_CHOICES = (
     ('ChromeOS', 'Chrome OS'),
 )
 
+# Changed whenever plugins are enabled, disabled, or reordered; see
+# sal.plugin.PluginRegistry.
+PLUGIN_VERSION_KEY = 'sal_plugin_version'
+
 REPORT_CHOICES = (
     ('base64', 'base64'),
     ('base64bz2', 'base64bz2'),
@@ -145,6 +151,42 @@ class Machine(models.Model):
     objects = models.Manager()  # The default manager.
     deployed_objects = DeployedManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        machine = super(Machine, cls).from_db(db, field_names, values)
+        machine._remember_placement()
+        return machine
+
+    def refresh_from_db(self, *args, **kwargs):
+        super(Machine, self).refresh_from_db(*args, **kwargs)
+        self._remember_placement()
+
+    def _remember_placement(self):
+        # The group and deployed state as saved, so that save can tell when
+        # the application install counts need to move.
+        if 'machine_group_id' in self.__dict__ and 'deployed' in self.__dict__:
+            self._placement = (self.machine_group_id, self.deployed)
+
+    def save(self, *args, **kwargs):
+        # inventory's models import this module.
+        from inventory import install_counts
+
+        placement = getattr(self, '_placement', None)
+        if placement and placement != (self.machine_group_id, self.deployed):
+            with transaction.atomic():
+                super(Machine, self).save(*args, **kwargs)
+                install_counts.move(self, *placement)
+        else:
+            super(Machine, self).save(*args, **kwargs)
+        self._remember_placement()
+
+    def delete(self, *args, **kwargs):
+        from inventory import install_counts
+
+        with transaction.atomic():
+            install_counts.remove(self)
+            return super(Machine, self).delete(*args, **kwargs)
+
     def get_fields(self):
         return [(field.name, field.value_to_string(self)) for field in Machine._meta.fields]
 
@@ -230,7 +272,28 @@ class PluginScriptRow(models.Model):
         ordering = ['pluginscript_name']
 
 
-class Plugin(models.Model):
+def bump_plugin_version():
+    """Make every process reload its PluginRegistry."""
+    cache.set(PLUGIN_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class EnabledPluginModel(models.Model):
+    """Base for models recording which plugins are enabled."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super(EnabledPluginModel, self).save(*args, **kwargs)
+        bump_plugin_version()
+
+    def delete(self, *args, **kwargs):
+        result = super(EnabledPluginModel, self).delete(*args, **kwargs)
+        bump_plugin_version()
+        return result
+
+
+class Plugin(EnabledPluginModel):
     name = models.CharField(max_length=255, unique=True)
     order = models.IntegerField()
 
@@ -241,7 +304,7 @@ class Plugin(models.Model):
         ordering = ['order']
 
 
-class MachineDetailPlugin(models.Model):
+class MachineDetailPlugin(EnabledPluginModel):
     name = models.CharField(max_length=255, unique=True)
     order = models.IntegerField()
 
@@ -252,7 +315,7 @@ class MachineDetailPlugin(models.Model):
         ordering = ['order']
 
 
-class Report(models.Model):
+class Report(EnabledPluginModel):
     name = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
@@ -293,8 +356,11 @@ class ApiKey(models.Model):
 
 
 class FriendlyNameCache(models.Model):
-    serial_stub = models.CharField(max_length=5)
+    serial_stub = models.CharField(db_index=True, max_length=5)
     friendly_name = models.CharField(max_length=255)
+    # Set on failed lookups, which have no friendly_name; the stub isn't
+    # looked up again until then.
+    retry_after = models.DateTimeField(null=True, blank=True)
 
 
 class ManagementSource(models.Model):
@@ -359,6 +425,11 @@ class Fact(models.Model):
 
     class Meta:
         ordering = ['fact_name']
+        indexes = [
+            models.Index(
+                fields=['machine', 'management_source', 'fact_name'],
+                name='server_fact_machine_source'),
+        ]
 
 
 class HistoricalFact(models.Model):
@@ -12,22 +12,21 @@ from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.http import (
-    HttpResponse, JsonResponse, Http404, HttpResponseBadRequest)
+    HttpResponse, JsonResponse, Http404, HttpResponseBadRequest, HttpResponseNotModified)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 import server.utils
 import utils.csv
 from sal.decorators import key_auth_required
-from sal.plugin import Widget, ReportPlugin, PluginManager
+from sal.plugin import PluginManager, PluginRegistry
 from server.models import (Machine, Fact, HistoricalFact, MachineGroup, Message, Plugin, Report,
                            ManagedItem, MachineDetailPlugin, ManagementSource, ManagedItemHistory)
 
 
-# The database probably isn't going to change while this is loaded.
-IS_POSTGRES = server.utils.is_postgres()
 HISTORICAL_FACTS = set(server.utils.get_django_setting('HISTORICAL_FACTS', []))
 if server.utils.get_django_setting('IGNORE_FACTS'):
     IGNORE_PREFIXES = re.compile(
@@ -136,13 +135,8 @@ def process_plugin(plugin_name, group_type='all', group_id=None):
         raise Http404
 
     # Ensure the request is not for a disabled plugin.
-    if isinstance(plugin, Widget):
-        model = Plugin
-    elif isinstance(plugin, ReportPlugin):
-        model = Report
-    else:
-        model = MachineDetailPlugin
-    get_object_or_404(model, name=plugin_name)
+    if plugin_name not in PluginRegistry.get_orders(plugin._db_model):
+        raise Http404
 
     return plugin
 
@@ -154,32 +148,30 @@ def export_csv(request, plugin_name, data, group_type='all', group_id=None):
         request, group_type=group_type, group_id=group_id)
     machines, title = plugin_object.filter_machines(queryset, data)
 
-    return utils.csv.get_csv_response(machines, utils.csv.machine_fields(), title)
+    return utils.csv.get_csv_response(machines, utils.csv.machine_fields(), title, request)
 
 
 @csrf_exempt
 @key_auth_required
 def preflight_v2(request):
-    """Find plugins that have embedded preflight scripts."""
+    """Find plugins that have embedded preflight scripts.
+
+    The response has an ETag, and requests whose If-None-Match matches
+    it get a 304.
+    """
     # Load in the default plugins if needed
     server.utils.load_default_plugins()
-    output = []
     # Old Sal scripts just do a GET; just send everything in that case.
     os_family = None if request.method != 'POST' else request.POST.get('os_family')
 
-    enabled_reports = Report.objects.all()
-    enabled_plugins = Plugin.objects.all()
-    enabled_detail_plugins = MachineDetailPlugin.objects.all()
-    for enabled_plugin in itertools.chain(enabled_reports, enabled_plugins, enabled_detail_plugins):
-        plugin = PluginManager.get_plugin_by_name(enabled_plugin.name)
-        if not plugin:
-            continue
-        if os_family is None or os_family in plugin.get_supported_os_families():
-            scripts = server.utils.get_plugin_scripts(plugin, hash_only=True)
-            if scripts:
-                output += scripts
-
-    return HttpResponse(json.dumps(output))
+    manifest, etag = server.utils.get_preflight_manifest(os_family)
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(manifest)
+    response['ETag'] = etag
+    return response
 
 
 @csrf_exempt
@@ -278,14 +270,6 @@ def checkin(request):
     server.utils.process_plugin_script(plugin_results, machine)
     server.utils.run_plugin_processing(machine, submission)
 
-    if server.utils.get_setting('send_data') in (None, True):
-        # If setting is None, it hasn't been configured yet; assume True
-        try:
-            # If the report server is down, don't halt all submissions
-            server.utils.send_report()
-        except Exception as e:
-            logger.debug(e)
-
     msg = f"Sal report submitted for {machine.serial}"
     logger.debug(msg)
     return HttpResponse(msg)
@@ -488,7 +472,7 @@ def create_objects(object_queue):
 
 
 def _bulk_create_or_iterate_save(objects, model):
-    if objects and IS_POSTGRES:
+    if objects and server.utils.is_postgres():
         model.objects.bulk_create(objects)
     else:
         for item in objects:
@@ -0,0 +1,230 @@
+"""Monthly range partitioning for high-churn history tables (Postgres only)
+
+`HistoricalFact` and `ManagedItemHistory` rows are appended at every
+checkin and only ever pruned by date. When the `PARTITION_HISTORY_TABLES`
+setting is enabled, their tables can be converted into Postgres
+declarative partitioned tables, split by calendar month on the recorded
+timestamp. Retention then becomes a `DROP TABLE` of whole expired months
+and date-ranged queries only scan the partitions they need.
+
+Each partitioned table also gets a DEFAULT partition so a checkin with an
+unexpected timestamp can never fail to insert; rows in it are moved into
+the proper partition when that month is created.
+
+`PluginScriptSubmission` is deliberately not partitioned: Postgres
+requires foreign keys that reference a partitioned table to include the
+partition key, and `PluginScriptRow.submission` references only its id.
+
+Public Functions:
+    partitioning_enabled
+    is_partitioned
+    convert_to_partitioned
+    create_partitions
+    drop_expired_partitions
+"""
+
+
+import datetime
+import re
+
+from django.db import connection, transaction
+
+import server.utils
+from server.models import HistoricalFact, ManagedItemHistory
+
+
+# Partitioned models, mapped to the column they are partitioned by.
+PARTITIONED_MODELS = {
+    HistoricalFact: 'fact_recorded',
+    ManagedItemHistory: 'recorded'}
+# Indexes recreated on the partitioned parent (and thus every
+# partition). The primary key is handled separately.
+PARTITION_INDEXES = {
+    HistoricalFact: (('machine_id',), ('management_source_id',)),
+    ManagedItemHistory: (('machine_id',), ('management_source_id',))}
+PARTITION_UNIQUE = {
+    ManagedItemHistory: (('machine_id', 'name', 'management_source_id', 'recorded'),)}
+PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def partitioning_enabled():
+    """Return whether the history tables should be partitioned."""
+    return (
+        server.utils.is_postgres() and
+        server.utils.get_django_setting('PARTITION_HISTORY_TABLES', False))
+
+
+def month_start(date):
+    return datetime.date(date.year, date.month, 1)
+
+
+def add_months(date, months):
+    """Return the first day of the month `months` after `date`'s month."""
+    month_index = date.year * 12 + date.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def partition_month(name):
+    """Return the month a partition covers, or None if not a month partition."""
+    match = PARTITION_SUFFIX.search(name)
+    if not match:
+        return None
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(model):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [model._meta.db_table])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def get_partitions(model):
+    """Return the names of all partitions attached to model's table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)', [model._meta.db_table])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def convert_to_partitioned(model, first_month, months_ahead):
+    """Rebuild model's table as a monthly partitioned table.
+
+    The existing table is renamed out of the way, a partitioned table is
+    created in its place with equivalent columns, keys, and indexes, and
+    the rows are copied across before the old table is dropped. This
+    runs in a single transaction and locks the table for its duration,
+    so it should be done during a maintenance window.
+
+    Args:
+        model (django.db.models.Model): One of PARTITIONED_MODELS.
+        first_month (datetime.date): Oldest month to create a partition
+            for. Older rows land in the default partition.
+        months_ahead (int): Number of future months to create partitions
+            for.
+    """
+    table = model._meta.db_table
+    old_table = f'{table}_unpartitioned'
+    column = PARTITIONED_MODELS[model]
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(old_table)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(old_table)} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ({qn(column)})')
+        # The old table keeps its constraint names, so name ours explicitly.
+        cursor.execute(
+            f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+            f'{qn(_constraint_name(table, ("id", column), "pk"))} '
+            f'PRIMARY KEY ("id", {qn(column)})')
+
+        for columns in PARTITION_INDEXES[model]:
+            cursor.execute(
+                f'CREATE INDEX {qn(_constraint_name(table, columns, "idx"))} ON {qn(table)} '
+                f'({", ".join(qn(c) for c in columns)})')
+        for columns in PARTITION_UNIQUE.get(model, ()):
+            cursor.execute(
+                f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+                f'{qn(_constraint_name(table, columns, "uniq"))} '
+                f'UNIQUE ({", ".join(qn(c) for c in columns)})')
+        for field in model._meta.concrete_fields:
+            if field.remote_field:
+                target = field.remote_field.model._meta.db_table
+                cursor.execute(
+                    f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+                    f'{qn(_constraint_name(table, (field.column,), "fk"))} '
+                    f'FOREIGN KEY ({qn(field.column)}) REFERENCES {qn(target)} ("id") '
+                    f'DEFERRABLE INITIALLY DEFERRED')
+
+        # BigAutoField sequences are owned by the old table's column and
+        # would be dropped along with it.
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [old_table, 'id'])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}."id"')
+
+        cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+        create_partitions(model, months_ahead, first_month=first_month)
+
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(old_table)}')
+        cursor.execute(f'DROP TABLE {qn(old_table)}')
+
+
+def create_partitions(model, months_ahead, first_month=None):
+    """Ensure monthly partitions exist through `months_ahead` months from now.
+
+    Any rows already sitting in the default partition for a newly
+    created month are moved into it, since Postgres refuses to attach a
+    partition whose range overlaps rows in the default partition.
+
+    Args:
+        model (django.db.models.Model): One of PARTITIONED_MODELS.
+        months_ahead (int): Number of future months to cover.
+        first_month (datetime.date): Month to start from. Defaults to
+            the current month.
+
+    Returns:
+        list of str: Names of the partitions created.
+    """
+    table = model._meta.db_table
+    column = PARTITIONED_MODELS[model]
+    qn = connection.ops.quote_name
+    current = month_start(datetime.date.today())
+    month = month_start(first_month) if first_month else current
+    last_month = add_months(current, months_ahead)
+    existing = set(get_partitions(model))
+    created = []
+
+    while month <= last_month:
+        name = partition_name(table, month)
+        if name not in existing:
+            start, end = month.isoformat(), add_months(month, 1).isoformat()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS '
+                    f'INCLUDING CONSTRAINTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {qn(table + "_default")} '
+                    f'WHERE {qn(column)} >= %s AND {qn(column)} < %s RETURNING *) '
+                    f'INSERT INTO {qn(name)} SELECT * FROM moved', [start, end])
+                cursor.execute(
+                    f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} '
+                    f'FOR VALUES FROM (%s) TO (%s)', [start, end])
+            created.append(name)
+        month = add_months(month, 1)
+
+    return created
+
+
+def drop_expired_partitions(model, datelimit):
+    """Drop partitions whose entire month falls before `datelimit`.
+
+    Args:
+        model (django.db.models.Model): One of PARTITIONED_MODELS.
+        datelimit (datetime.datetime): Retention cutoff.
+
+    Returns:
+        list of str: Names of the partitions dropped.
+    """
+    qn = connection.ops.quote_name
+    cutoff = month_start(datelimit.date())
+    dropped = []
+    for name in get_partitions(model):
+        month = partition_month(name)
+        if month and add_months(month, 1) <= cutoff:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {qn(name)}')
+            dropped.append(name)
+    return dropped
+
+
+def _constraint_name(table, columns, suffix):
+    return f'{table}_{"_".join(columns)}_{suffix}'[:63]
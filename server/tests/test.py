@@ -3,28 +3,155 @@
 
 import unittest.mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 import sal.plugin
 from server import utils
+from server.management.commands.benchmark_startup import parse_importtime
 from server.models import Plugin
 
 
 class PluginUtilsTest(TestCase):
     """Test the plugin utilities."""
 
+    def setUp(self):
+        sal.plugin.PluginRegistry.invalidate()
+
     def test_remove_missing_plugins(self):
         """Ensure removed from disk are also removed from the DB."""
         Plugin.objects.create(name='Test', order=0)
         utils.reload_plugins_model()
         self.assertEqual(len(Plugin.objects.all()), 0)
 
+    def test_discovery_order(self):
+        """Ensure plugins are loaded by plugin place, then path."""
+        places = ['/plugins', '/sal/server/plugins']
+        paths = ['/sal/server/plugins/a/a.yapsy-plugin', '/unknown/a.yapsy-plugin',
+                 '/plugins/b/b.yapsy-plugin', '/plugins/a/a.yapsy-plugin']
+        self.assertEqual(
+            sorted(paths, key=lambda path: sal.plugin._candidate_sort_key(path, places)),
+            ['/plugins/a/a.yapsy-plugin', '/plugins/b/b.yapsy-plugin',
+             '/sal/server/plugins/a/a.yapsy-plugin', '/unknown/a.yapsy-plugin'])
+        sal.plugin.PluginManager.get()
+        self.assertIn('plugins', sal.plugin.PluginManager.discovery_timings)
+
     def test_default_plugin_load(self):
         """Ensure that no plugins result in a default loadout."""
         self.assertEqual(Plugin.objects.count(), 0)
         utils.load_default_plugins()
         self.assertNotEqual(Plugin.objects.count(), 0)
 
+    def test_default_plugin_load_with_stale_registry(self):
+        """Ensure a stale, empty registry doesn't insert the defaults twice."""
+        self.assertEqual(sal.plugin.PluginRegistry.get_orders(Plugin), {})
+        # Another worker's insert, which doesn't reach this process.
+        Plugin.objects.bulk_create(
+            Plugin(name=name, order=order) for order, name in enumerate(utils.PLUGIN_ORDER))
+        self.assertEqual(sal.plugin.PluginRegistry.get_orders(Plugin), {})
+
+        utils.load_default_plugins()
+        self.assertEqual(Plugin.objects.count(), len(utils.PLUGIN_ORDER))
+
+
+class PluginRegistryTest(TestCase):
+    """Test the cached enabled plugin registry."""
+
+    def setUp(self):
+        sal.plugin.PluginRegistry.invalidate()
+        utils.load_default_plugins()
+
+    def test_no_queries_once_loaded(self):
+        sal.plugin.PluginRegistry.get_enabled()
+        with self.assertNumQueries(0):
+            utils.load_default_plugins()
+            utils.get_report_names()
+            names = [plugin.name for plugin in sal.plugin.PluginRegistry.get_enabled(Plugin)]
+            self.assertEqual(names, [name for name in utils.PLUGIN_ORDER if name in names])
+            self.assertTrue(sal.plugin.PluginManager.get_plugin_by_name('Activity').enabled)
+
+    def test_reload_on_change(self):
+        activity = sal.plugin.PluginManager.get_plugin_by_name('Activity')
+        self.assertEqual(activity.order, 0)
+
+        Plugin.objects.get(name='Activity').delete()
+        self.assertFalse(activity.enabled)
+        Plugin.objects.create(name='Activity', order=100)
+        self.assertEqual(activity.order, 100)
+        self.assertEqual(sal.plugin.PluginRegistry.get_enabled(Plugin)[-1].name, 'Activity')
+
+
+class CheckinWidget(sal.plugin.Widget):
+
+    def __init__(self):
+        super().__init__()
+        self.checkins = []
+
+    def checkin_processor(self, machine, report_data):
+        self.checkins.append(report_data)
+
+
+class PluginHookTest(TestCase):
+    """Test dispatching checkin hooks to plugins."""
+
+    def setUp(self):
+        self.processor = CheckinWidget()
+        plugins = {'CheckinWidget': self.processor, 'Widget': sal.plugin.Widget()}
+        patcher = unittest.mock.patch(
+            'sal.plugin.PluginManager.get_plugin_by_name', side_effect=plugins.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(sal.plugin.PluginRegistry.invalidate)
+        Plugin.objects.create(name='Widget', order=0)
+        Plugin.objects.create(name='CheckinWidget', order=1)
+        sal.plugin.PluginRegistry.hook_timings.clear()
+
+    def test_dispatch_only_to_overrides(self):
+        self.assertEqual(
+            sal.plugin.PluginRegistry.get_hook_plugins('checkin_processor'), [self.processor])
+        self.assertEqual(sal.plugin.PluginRegistry.get_hook_plugins('profiles_processor'), [])
+
+        utils.run_plugin_processing(None, {'report': True})
+        utils.run_profiles_plugin_processing(None, [])
+        self.assertEqual(self.processor.checkins, [{'report': True}])
+        self.assertEqual(
+            list(sal.plugin.PluginRegistry.hook_timings), [('CheckinWidget', 'checkin_processor')])
+        self.assertEqual(sal.plugin.PluginRegistry.hook_timings[('CheckinWidget', 'checkin_processor')][0], 1)
+
+
+@override_settings(
+    LIMIT_PLUGIN_TO_FRONT_PAGE=['Activity'], HIDE_PLUGIN_FROM_FRONT_PAGE=['Uptime'],
+    HIDE_PLUGIN_FROM_BUSINESS_UNIT={'Encryption': ['1']},
+    HIDE_PLUGIN_FROM_MACHINE_GROUP={'DiskSpace': [2]})
+class HiddenPluginsTest(TestCase):
+    """Test hidden plugin resolution."""
+
+    def setUp(self):
+        utils._hidden_plugin_lookup.cache_clear()
+        self.addCleanup(utils._hidden_plugin_lookup.cache_clear)
+
+    def test_lookup(self):
+        self.assertEqual(utils.get_hidden_plugins(), ('Uptime',))
+        self.assertEqual(utils.get_hidden_plugins('business_unit', 1), ('Activity', 'Encryption'))
+        self.assertEqual(utils.get_hidden_plugins('machine_group', '2'), ('Activity', 'DiskSpace'))
+        self.assertEqual(utils.get_hidden_plugins('machine_group', 1), ('Activity',))
+
+    def test_repeated_calls_do_not_grow(self):
+        first = utils.get_hidden_plugins('business_unit', 1)
+        utils.get_plugin_placeholder_markup('business_unit', 1)
+        with CaptureQueriesContext(connection) as first_queries:
+            utils.get_plugin_placeholder_markup('business_unit', 1)
+        for _ in range(10):
+            self.assertIs(utils.get_hidden_plugins('business_unit', 1), first)
+        with CaptureQueriesContext(connection) as last_queries:
+            utils.get_plugin_placeholder_markup('business_unit', 1)
+
+        self.assertEqual(settings.LIMIT_PLUGIN_TO_FRONT_PAGE, ['Activity'])
+        self.assertEqual(
+            [query['sql'] for query in first_queries], [query['sql'] for query in last_queries])
+
 
 class ServerUtilsTest(TestCase):
     """Test the server app utilities"""
@@ -38,3 +165,15 @@ class ServerUtilsTest(TestCase):
         version_result = utils.get_server_version()
 
         self.assertEqual(version_result, version)
+
+
+class BenchmarkStartupTest(TestCase):
+    """Test parsing `python -X importtime` output."""
+
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       182 |        376 |   django.core.wsgi\n'
+            'import time:      9490 |      62715 | sal.wsgi\n')
+        self.assertEqual(
+            parse_importtime(output), [('django.core.wsgi', 376, 1), ('sal.wsgi', 62715, 0)])
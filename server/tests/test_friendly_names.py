@@ -0,0 +1,110 @@
+"""Tests for friendly model name resolution."""
+
+
+import datetime
+import http.server
+import io
+import threading
+import urllib.parse
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from server import friendly_names
+from server.models import BusinessUnit, FriendlyNameCache, Machine, MachineGroup
+
+
+MODELS = {'Q6L4': 'MacBook Air (13-inch, Early 2015)'}
+
+
+class LookupHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in for Apple's product lookup."""
+
+    requests = []
+
+    def do_GET(self):
+        stub = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)['cc'][0]
+        self.requests.append(stub)
+        if stub in MODELS:
+            body = f'<root><configCode>{MODELS[stub]}</configCode></root>'.encode()
+        else:
+            body = b'<root><error>CPU</error></root>'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FriendlyModelNameTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), LookupHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/sp/product'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        LookupHandler.requests = []
+        business_unit = BusinessUnit.objects.create(name='BU')
+        group = MachineGroup.objects.create(name='Group', business_unit=business_unit)
+        serials = ['C02AAAAAQ6L4', 'C02BBBBBQ6L4', 'C02CCCCCQ6L4', 'C02DDDDDXXXX', 'VMabcdefghij']
+        for serial in serials:
+            Machine.objects.create(
+                serial=serial, machine_group=group, machine_model='MacBookAir7,2', os_family='Darwin')
+
+    def test_each_stub_resolved_once(self):
+        with override_settings(FRIENDLY_NAME_LOOKUP_URL=self.url):
+            call_command('friendly_model_name', stdout=io.StringIO())
+
+        self.assertEqual(sorted(LookupHandler.requests), ['Q6L4', 'XXXX'])
+        self.assertEqual(
+            dict(Machine.objects.values_list('serial', 'machine_model_friendly')),
+            {'C02AAAAAQ6L4': MODELS['Q6L4'], 'C02BBBBBQ6L4': MODELS['Q6L4'],
+             'C02CCCCCQ6L4': MODELS['Q6L4'], 'C02DDDDDXXXX': None, 'VMabcdefghij': None})
+
+    def test_failures_retried_after_delay(self):
+        with override_settings(FRIENDLY_NAME_LOOKUP_URL=self.url):
+            call_command('friendly_model_name', stdout=io.StringIO())
+            call_command('friendly_model_name', stdout=io.StringIO())
+            self.assertEqual(sorted(LookupHandler.requests), ['Q6L4', 'XXXX'])
+
+            FriendlyNameCache.objects.filter(serial_stub='XXXX').update(
+                retry_after=now() - datetime.timedelta(seconds=1))
+            call_command('friendly_model_name', stdout=io.StringIO())
+        self.assertEqual(sorted(LookupHandler.requests), ['Q6L4', 'XXXX', 'XXXX'])
+        self.assertEqual(FriendlyNameCache.objects.filter(serial_stub='XXXX').count(), 1)
+
+    def test_unreachable_server_retried_soon(self):
+        with override_settings(FRIENDLY_NAME_LOOKUP_URL='http://127.0.0.1:9/sp/product'):
+            self.assertEqual(friendly_names.resolve(['Q6L4']), {})
+        entry = FriendlyNameCache.objects.get(serial_stub='Q6L4')
+        self.assertEqual(entry.friendly_name, '')
+        self.assertGreater(entry.retry_after, now())
+        self.assertLessEqual(
+            entry.retry_after,
+            now() + datetime.timedelta(seconds=friendly_names.DEFAULT_TRANSPORT_RETRY_AFTER))
+
+    def test_no_name_cached_for_a_week(self):
+        with override_settings(FRIENDLY_NAME_LOOKUP_URL=self.url):
+            self.assertEqual(friendly_names.resolve(['XXXX']), {})
+        entry = FriendlyNameCache.objects.get(serial_stub='XXXX')
+        self.assertEqual(entry.friendly_name, '')
+        self.assertGreater(
+            entry.retry_after,
+            now() + datetime.timedelta(seconds=friendly_names.DEFAULT_RETRY_AFTER - 60))
+
+    def test_serial_stub(self):
+        self.assertEqual(friendly_names.serial_stub('C02AAAAAQ6L4'), 'Q6L4')
+        self.assertEqual(friendly_names.serial_stub('W8812345ABC'), 'ABC')
+        self.assertIsNone(friendly_names.serial_stub('VMabcdefghij'))
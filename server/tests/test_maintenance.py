@@ -0,0 +1,127 @@
+"""Tests for the server app's maintenance commands."""
+
+
+import datetime
+import io
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.timezone import now
+
+import server.utils
+from server import partitions
+from server.models import (
+    Machine, ManagementSource, HistoricalFact, PluginScriptSubmission, PluginScriptRow)
+
+
+class ServerMaintenanceTest(TestCase):
+    """Test retention pruning in server_maintenance."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def setUp(self):
+        self.machine = Machine.objects.get(serial='C0DEADBEEF')
+        self.expired = now() - datetime.timedelta(days=365)
+
+    def test_expired_rows_deleted_in_batches(self):
+        """Ensure all expired rows are removed regardless of batch size."""
+        source = ManagementSource.objects.create(name='Test')
+        for i in range(5):
+            HistoricalFact.objects.create(
+                machine=self.machine, management_source=source, fact_name=f'fact{i}',
+                fact_data='', fact_recorded=self.expired)
+        HistoricalFact.objects.create(
+            machine=self.machine, management_source=source, fact_name='current', fact_data='',
+            fact_recorded=now())
+
+        call_command('server_maintenance', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(
+            list(HistoricalFact.objects.values_list('fact_name', flat=True)), ['current'])
+
+    def test_submission_rows_cascade(self):
+        """Ensure expired submissions take their rows with them."""
+        submission = PluginScriptSubmission.objects.create(machine=self.machine, plugin='Test')
+        PluginScriptSubmission.objects.filter(pk=submission.pk).update(recorded=self.expired)
+        PluginScriptRow(
+            submission=submission, pluginscript_name='test', pluginscript_data='1').save()
+
+        call_command('server_maintenance', batch_size=1, stdout=io.StringIO())
+        self.assertFalse(PluginScriptSubmission.objects.exists())
+        self.assertFalse(PluginScriptRow.objects.exists())
+
+    def test_orphaned_sources_deleted(self):
+        """Ensure only sources without any related data are removed."""
+        ManagementSource.objects.create(name='Orphan')
+        used = ManagementSource.objects.create(name='Used')
+        HistoricalFact.objects.create(
+            machine=self.machine, management_source=used, fact_name='current', fact_data='',
+            fact_recorded=now())
+
+        call_command('server_maintenance', stdout=io.StringIO())
+        names = set(ManagementSource.objects.values_list('name', flat=True))
+        self.assertIn('Used', names)
+        self.assertNotIn('Orphan', names)
+
+
+class PeriodicTasksTest(TestCase):
+    """Test the outbound tasks run by periodic_tasks."""
+
+    @patch('requests.post')
+    @patch('requests.get')
+    def test_tasks_refresh_cached_results(self, mock_get, mock_post):
+        mock_get.return_value = Mock(status_code=200, text='99.0.0')
+        mock_post.return_value = Mock(status_code=200, text='')
+        self.assertIsNone(server.utils.get_current_release_version_number())
+
+        call_command('periodic_tasks', stdout=io.StringIO())
+        self.assertEqual(server.utils.get_current_release_version_number(), '99.0.0')
+        self.assertTrue(server.utils.check_version()['new_version_available'])
+        mock_post.assert_called_once()
+
+        # Both tasks wait a day before going out again.
+        call_command('periodic_tasks', stdout=io.StringIO())
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch('requests.post')
+    @patch('requests.get', return_value=Mock(status_code=200, text='99.0.0'))
+    def test_report_opt_out(self, mock_get, mock_post):
+        server.utils.set_setting('send_data', False)
+        call_command('periodic_tasks', stdout=io.StringIO())
+        mock_post.assert_not_called()
+
+    @patch('requests.post', side_effect=Exception('down'))
+    @patch('requests.get', return_value=Mock(status_code=200, text='99.0.0'))
+    def test_failure_does_not_stop_other_tasks(self, mock_get, mock_post):
+        stderr = io.StringIO()
+        call_command('periodic_tasks', stdout=io.StringIO(), stderr=stderr)
+        self.assertIn('send_report failed: down', stderr.getvalue())
+        self.assertEqual(server.utils.get_current_release_version_number(), '99.0.0')
+
+
+class PartitionHelperTest(TestCase):
+    """Test the partition month arithmetic and naming helpers."""
+
+    def test_add_months_wraps_year(self):
+        """Ensure month arithmetic crosses year boundaries."""
+        self.assertEqual(
+            partitions.add_months(datetime.date(2019, 11, 15), 3), datetime.date(2020, 2, 1))
+        self.assertEqual(
+            partitions.add_months(datetime.date(2020, 1, 1), -1), datetime.date(2019, 12, 1))
+
+    def test_partition_name_round_trip(self):
+        """Ensure partition names can be parsed back into their month."""
+        month = datetime.date(2020, 6, 1)
+        name = partitions.partition_name('server_historicalfact', month)
+        self.assertEqual(name, 'server_historicalfact_p202006')
+        self.assertEqual(partitions.partition_month(name), month)
+        self.assertIsNone(partitions.partition_month('server_historicalfact_default'))
+
+    def test_command_noop_without_postgres(self):
+        """Ensure the command does nothing when partitioning is unavailable."""
+        call_command('partition_maintenance', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('partition_maintenance', convert=True, stdout=io.StringIO())
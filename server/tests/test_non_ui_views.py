@@ -17,7 +17,7 @@ from django.test import TestCase, Client
 from django.utils.timezone import now
 
 import server.utils
-from sal.plugin import Widget, ReportPlugin, DetailPlugin
+from sal.plugin import Widget, ReportPlugin, DetailPlugin, PluginRegistry
 from server import non_ui_views
 from server.models import (
     MachineGroup, Machine, ManagementSource, ManagedItem, ManagedItemHistory, Fact, HistoricalFact,
@@ -44,6 +44,18 @@ class CheckinDataTest(TestCase):
         response = self.client.post(self.url, data={})
         self.assertEqual(response.status_code, 401)
 
+    @patch('requests.post')
+    def test_checkin_sends_no_report(self, mock_post):
+        """Ensure telemetry is left to the periodic_tasks command."""
+        server.utils.set_setting('send_data', True)
+        machine = Machine.objects.get(serial='C0DEADBEEF')
+        data = json.dumps({
+            'Machine': {'extra_data': {'serial': machine.serial}},
+            'Sal': {'extra_data': {'key': machine.machine_group.key}}})
+        response = self.client.post(self.url, data, content_type=self.content_type)
+        self.assertEqual(response.status_code, 200)
+        mock_post.assert_not_called()
+
     def test_checkin_data_empty(self):
         """Ensure that checkins with missing data get a 400 response."""
         response = self.client.post(self.url, data=json.dumps({}), content_type=self.content_type)
@@ -550,3 +562,48 @@ class PluginTest(TestCase):
         """Test that requesting enabled, existing detail plugins works"""
         manager.return_value = DetailPlugin()
         self.assertTrue(non_ui_views.process_plugin(plugin_name=self.machine_detail_plugin.name))
+
+
+class PreflightTest(TestCase):
+    """Test the cached preflight script manifest."""
+
+    def setUp(self):
+        settings.BASIC_AUTH = False
+        PluginRegistry.invalidate()
+        server.utils.load_default_plugins()
+
+    def test_manifest(self):
+        response = self.client.post('/preflight-v2/', {'os_family': 'Darwin'})
+        self.assertEqual(response.status_code, 200)
+        scripts = json.loads(response.content)
+        self.assertIn(
+            ('Encryption', 'encryption.py'), [(s['plugin'], s['filename']) for s in scripts])
+        self.assertNotIn('content', scripts[0])
+
+        with patch('pathlib.Path.read_text', side_effect=AssertionError):
+            response = self.client.post(
+                '/preflight-v2/', {'os_family': 'Darwin'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_manifest_reused(self):
+        """Ensure an unchanged manifest isn't rebuilt."""
+        first = self.client.post('/preflight-v2/', {'os_family': 'Darwin'})
+        cached = server.utils._manifest_cache['Darwin']
+        second = self.client.post('/preflight-v2/', {'os_family': 'Darwin'})
+        self.assertIs(server.utils._manifest_cache['Darwin'], cached)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, first.content)
+
+    def test_manifest_changes_with_plugins(self):
+        etag = self.client.get('/preflight-v2/')['ETag']
+        Plugin.objects.get(name='Encryption').delete()
+        response = self.client.get('/preflight-v2/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Encryption', [s['plugin'] for s in json.loads(response.content)])
+
+    def test_get_script(self):
+        response = self.client.get('/preflight-v2/get-script/Encryption/encryption.py/')
+        script = json.loads(response.content)[0]
+        self.assertTrue(script['content'].startswith('#!'))
+        response = self.client.get('/preflight-v2/get-script/Encryption/missing.py/')
+        self.assertEqual(json.loads(response.content), [])
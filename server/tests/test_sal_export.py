@@ -0,0 +1,55 @@
+"""Tests for the sal_export command."""
+
+
+import csv
+import gzip
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.test import TestCase
+
+from server.management.commands import sal_export
+
+from server.models import Fact, Machine
+
+
+class SalExportTest(TestCase):
+    """Test exporting tables to gzipped CSV."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def test_export_facts(self):
+        """Ensure rows are exported with their machine's serial and group."""
+        machine = Machine.objects.get(serial='C0DEADBEEF')
+        Fact.objects.create(machine=machine, fact_name='os', fact_data='Darwin')
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            stdout = io.StringIO()
+            call_command('sal_export', 'facts', '--output-dir', output_dir, stdout=stdout)
+            with gzip.open(os.path.join(output_dir, 'facts.csv.gz'), 'rt', newline='') as export:
+                rows = list(csv.reader(export))
+
+        self.assertIn('Exported 1 facts rows', stdout.getvalue())
+        self.assertEqual(rows[0], ['serial', 'machine_group', 'fact_name', 'fact_data'])
+        self.assertEqual(rows[1], ['C0DEADBEEF', machine.machine_group.name, 'os', 'Darwin'])
+
+
+class ProgressWriterTest(TestCase):
+    """Test progress reporting for COPY exports."""
+
+    def test_reports_each_interval(self):
+        export_file = io.BytesIO()
+        stdout = io.StringIO()
+        writer = sal_export.ProgressWriter(export_file, OutputWrapper(stdout))
+        chunk = b'row\n' * (sal_export.PROGRESS_INTERVAL // 2 + 1)
+        for _ in range(4):
+            writer.write(chunk)
+
+        self.assertEqual(export_file.getvalue(), chunk * 4)
+        interval = sal_export.PROGRESS_INTERVAL
+        self.assertEqual(
+            stdout.getvalue().splitlines(), [f'  {interval} rows...', f'  {interval * 2} rows...'])
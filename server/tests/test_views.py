@@ -0,0 +1,148 @@
+"""Tests for the server app's UI views."""
+
+
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.utils.timezone import now
+
+import server.utils
+from sal.plugin import PluginRegistry
+from server.models import (
+    Fact, Machine, ManagedItem, ManagedItemHistory, ManagementSource, Message, Plugin,
+    PluginScriptRow, PluginScriptSubmission)
+
+
+class MachineDetailTest(TestCase):
+    """Test the machine detail page."""
+
+    fixtures = [
+        'user_fixture.json', 'machine_group_fixtures.json', 'business_unit_fixtures.json',
+        'machine_fixtures.json']
+    # Session, user, machine (with its group and business unit), a query
+    # each for facts, uptime, managed items, histories, messages and fact
+    # sources, and the access check's and template's user profile lookups.
+    expected_queries = 14
+
+    def setUp(self):
+        PluginRegistry.invalidate()
+        user = User.objects.get(pk=1)
+        user_profile = user.userprofile
+        user_profile.level = 'GA'
+        user_profile.save()
+        settings.BASIC_AUTH = False
+        self.client = Client()
+        self.client.force_login(user)
+        server.utils.set_setting('send_data', False)
+
+        self.machine = Machine.objects.get(serial='C0DEADBEEF')
+        self.url = f'/machine_detail/{self.machine.pk}/'
+        self.munki = ManagementSource.objects.create(name='Munki')
+        self.salt = ManagementSource.objects.create(name='Salt')
+        Plugin.objects.create(name='Uptime', order=0)
+        submission = PluginScriptSubmission.objects.create(
+            machine=self.machine, plugin='Uptime', recorded=now())
+        PluginScriptRow(
+            submission=submission, pluginscript_name='UptimeSeconds', pluginscript_data='90061',
+            submission_and_script_name='Uptime: UptimeSeconds').save()
+        for source, name, data in (
+                (self.munki, 'RunType', 'auto'), (self.salt, 'saltversion', '3000'),
+                (None, 'ipv4_address', '10.0.0.1')):
+            Fact.objects.create(
+                machine=self.machine, management_source=source, fact_name=name, fact_data=data)
+
+    def add_items(self, count):
+        start = ManagedItem.objects.count() // 2
+        for i in range(start, start + count):
+            for source, status in ((self.munki, 'PENDING'), (self.salt, 'PRESENT')):
+                name = f'{source.name} item {i}'
+                ManagedItem.objects.create(
+                    machine=self.machine, management_source=source, name=name, status=status,
+                    data=json.dumps({'type': 'ManagedInstalls'}))
+                ManagedItemHistory.objects.create(
+                    machine=self.machine, management_source=source, name=name, status=status,
+                    recorded=now())
+            Message.objects.create(
+                machine=self.machine, management_source=self.munki, text=f'Message {i}',
+                message_type='WARNING')
+
+    def test_context(self):
+        self.add_items(2)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['ip_address'], '10.0.0.1')
+        self.assertEqual(response.context['uptime'], '1 day, 1 hour')
+        self.assertEqual(len(response.context['pending']), 2)
+        self.assertEqual(
+            response.context['management_tools'],
+            [('Munki Manifest', self.machine.manifest), ('Munki RunType', 'auto'),
+             ('Munki Version', self.machine.munki_version), ('Salt saltversion', '3000')])
+        self.assertEqual(len(response.context['histories']['Salt||Salt item 1']), 1)
+        self.assertEqual(len(response.context['messages']['WARNING']), 2)
+
+    def test_query_count(self):
+        """Ensure the query count doesn't grow with a machine's items."""
+        self.add_items(1)
+        self.client.get(self.url)
+        with self.assertNumQueries(self.expected_queries):
+            self.client.get(self.url)
+
+        self.add_items(25)
+        with self.assertNumQueries(self.expected_queries):
+            self.client.get(self.url)
+
+
+class MachineDetailFactsTest(TestCase):
+    """Test the server-side machine facts table."""
+
+    fixtures = [
+        'user_fixture.json', 'machine_group_fixtures.json', 'business_unit_fixtures.json',
+        'machine_fixtures.json']
+
+    def setUp(self):
+        user = User.objects.get(pk=1)
+        user_profile = user.userprofile
+        user_profile.level = 'GA'
+        user_profile.save()
+        self.client = Client()
+        self.client.force_login(user)
+
+        machine = Machine.objects.get(serial='C0DEADBEEF')
+        self.url = f'/machine_detail/facts/{machine.pk}/Puppet/'
+        puppet = ManagementSource.objects.create(name='Puppet')
+        Fact.objects.bulk_create(
+            Fact(machine=machine, management_source=puppet, fact_name=f'fact{i:02}', fact_data=str(i))
+            for i in range(30))
+        Fact.objects.create(
+            machine=machine, management_source=puppet, fact_name='markup', fact_data='<b>bold</b>')
+        Fact.objects.create(
+            machine=machine, management_source=None, fact_name='legacy', fact_data='')
+
+    def get_page(self, **params):
+        params.setdefault('start', 0)
+        params.setdefault('length', 10)
+        response = self.client.get(self.url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return json.loads(response.content)
+
+    def test_page_renders_table(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['title'], 'Puppet Facts for mla680')
+        self.assertContains(response, f'data-source-url="{self.url}"')
+        self.assertNotContains(response, 'fact00')
+
+    def test_paging_and_ordering(self):
+        data = self.get_page(start=10, **{'order[0][column]': 0, 'order[0][dir]': 'desc'})
+        self.assertEqual(data['recordsTotal'], 31)
+        self.assertEqual(data['recordsFiltered'], 31)
+        self.assertEqual([row['0'] for row in data['data']], [f'fact{i}' for i in range(20, 10, -1)])
+
+    def test_search_escapes_data(self):
+        data = self.get_page(**{'search[value]': 'bold'})
+        self.assertEqual(data['recordsFiltered'], 1)
+        self.assertEqual(data['data'][0]['1'], '&lt;b&gt;bold&lt;/b&gt;')
+
+    def test_legacy_source(self):
+        self.url = self.url.replace('Puppet', 'None')
+        self.assertEqual(self.get_page()['recordsTotal'], 1)
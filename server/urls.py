@@ -10,8 +10,8 @@ urlpatterns = [
     path('', index, name='home'),
     path('dashboard/<int:bu_id>/', bu_dashboard, name='bu_dashboard'),
     path('machinegroup/<int:group_id>/', group_dashboard, name='group_dashboard'),
-    path('machine_detail/facts/<int:machine_id>/<management_source>/', machine_detail_facts,
-         name='machine_detail_facts'),
+    path('machine_detail/facts/<int:machine_id>/<management_source>/',
+         MachineDetailFactsView.as_view(), name='machine_detail_facts'),
     path('machine_detail/<int:machine_id>/', machine_detail, name='machine_detail'),
     # Handle special case of allowing serial number "permalinks".
     # This will trigger a ValueError in the decorator code by design!
@@ -1,3 +1,5 @@
+import collections
+import functools
 import hashlib
 import itertools
 import json
@@ -5,12 +7,10 @@ import os
 import pathlib
 import plistlib
 import time
-import xml.etree.ElementTree as ET
+import types
 from distutils.version import LooseVersion
 from itertools import chain
 
-import requests
-
 from django.conf import settings
 # from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.core.exceptions import ValidationError
@@ -20,7 +20,7 @@ from django.shortcuts import get_object_or_404
 from django.templatetags.static import static
 
 from sal.decorators import is_global_admin
-from sal.plugin import BasePlugin, Widget, PluginManager, DetailPlugin, ReportPlugin
+from sal.plugin import BasePlugin, Widget, PluginManager, PluginRegistry, DetailPlugin, ReportPlugin
 from sal.settings import PROJECT_DIR
 from server.models import *
 from utils.text_utils import safe_text
@@ -36,6 +36,7 @@ TRUTHY = {'TRUE', 'YES'}
 FALSY = {'FALSE', 'NO'}
 STRINGY_BOOLS = TRUTHY.union(FALSY)
 TWENTY_FOUR_HOURS = 86400
+OUTBOUND_REQUEST_TIMEOUT = 10
 EXCLUDED_SCRIPT_TYPES = ('.pyc',)
 
 
@@ -77,7 +78,20 @@ def get_server_version():
 def get_current_release_version_number():
     """Get the currently available Sal version.
 
-    Only checks once per 24 hours.
+    Only reads the result of the last check made by
+    `refresh_current_release_version`, so it never waits on the network.
+
+    Returns:
+        (str) Version number if it has been retrieved, otherwise None.
+    """
+    return get_setting('current_version')
+
+
+def refresh_current_release_version():
+    """Fetch the currently available Sal version.
+
+    Only checks once per 24 hours. Run by the `periodic_tasks` command
+    rather than in request paths.
 
     Returns:
         (str) Version number if it could be retrieved, otherwise None.
@@ -87,8 +101,11 @@ def get_current_release_version_number():
     current_version = None
 
     if last_version_check < (current_time - TWENTY_FOUR_HOURS):
+        # Only needed once a day; don't load it with every process.
+        import requests
         try:
-            response = requests.get('https://version.salopensource.com')
+            response = requests.get(
+                'https://version.salopensource.com', timeout=OUTBOUND_REQUEST_TIMEOUT)
             if response.status_code == 200:
                 current_version = response.text
         except requests.exceptions.RequestException:
@@ -111,7 +128,10 @@ def get_install_type():
 
 
 def send_report():
-    """Send report data if last report was sent over 24 hours ago."""
+    """Send report data if last report was sent over 24 hours ago.
+
+    Run by the `periodic_tasks` command rather than in request paths.
+    """
     last_sent = get_setting('last_sent_data', 0)
 
     current_time = time.time()
@@ -128,9 +148,11 @@ def send_report():
         output['version'] = get_server_version()
         # plist encode output
         post_data = plistlib.dumps(output)
-        response = requests.post('https://version.salopensource.com', data={"data": post_data}, timeout=0.5)
+        import requests
+        response = requests.post(
+            'https://version.salopensource.com', data={"data": post_data},
+            timeout=OUTBOUND_REQUEST_TIMEOUT)
         set_setting('last_sent_data', int(current_time))
-        print(response.status_code)
         if response.status_code == 200:
             return response.text
         else:
@@ -181,46 +203,6 @@ def is_postgres():
     return db_setting == postgres_backend
 
 
-def friendly_machine_model(machine):
-    # See if the machine's model already has one (and only one) friendly name
-    output = None
-    if machine.machine_model_friendly and machine.machine_model_friendly != '':
-        output = machine.machine_model_friendly
-
-    if not output and not machine.serial.startswith('VM') and machine.os_family == 'Darwin':
-        if len(machine.serial) > 11:
-            serial_snippet = machine.serial[-4:]
-        else:
-            # older models product code is the last three characters of the serial
-            serial_snippet = machine.serial[-3:]
-        payload = {'cc': serial_snippet}
-        try:
-            friendly_cache_item = FriendlyNameCache.objects.get(serial_stub=serial_snippet)
-            print(f'cache item is: {friendly_cache_item.friendly_name}')
-            output = friendly_cache_item.friendly_name
-        except FriendlyNameCache.DoesNotExist:
-            output = None
-            try:
-                r = requests.get('http://support-sp.apple.com/sp/product', params=payload)
-            except requests.exceptions.RequestException as e:
-                print(machine.serial)
-                print(e)
-
-            try:
-                output = ET.fromstring(r.text).find('configCode').text
-
-                new_cache_item = FriendlyNameCache(
-                    serial_stub=serial_snippet,
-                    friendly_name=output
-                )
-                new_cache_item.save()
-            except Exception as e:
-                print(f'Did not receive a model name for {machine.serial}, '
-                      f'{machine.machine_model}. Error: {e}')
-
-    return output
-
-
 def display_time(seconds, granularity=2):
     result = []
     intervals = (
@@ -417,6 +399,11 @@ def get_plugin_scripts(plugin, hash_only=False, script_name=None):
     Also, can retrieve a single script by name. Return value is always
     a list!
 
+    Scripts are read and hashed once, and only read again when the
+    modification times or sizes in the scripts dir change. That is
+    checked at most every `PLUGIN_SCRIPT_CHECK_INTERVAL` seconds
+    (default 10).
+
     Args:
         plugin (sal.plugin.BasePlugin): Plugin returned from a
             PluginManager.
@@ -432,7 +419,58 @@ def get_plugin_scripts(plugin, hash_only=False, script_name=None):
             hash (str): SHA256 hash of script contents (hash_only).
             content (str): Content of script (NOT hash_only).
     """
-    results = []
+    scripts = _get_cached_scripts(plugin)
+    if script_name:
+        scripts = [script for script in scripts if script['filename'] == script_name]
+    if hash_only:
+        return [{k: v for k, v in script.items() if k != 'content'} for script in scripts]
+    return [dict(script) for script in scripts]
+
+
+def get_preflight_manifest(os_family=None):
+    """Return the enabled plugins' scripts for preflight_v2.
+
+    The manifest is rebuilt only when the enabled plugins or their
+    scripts have changed.
+
+    Args:
+        os_family (str): Only include plugins supporting this OS
+            family, or None for all of them.
+
+    Returns:
+        Tuple of the JSON list of script hashes (as returned by
+        `get_plugin_scripts`) and its ETag.
+    """
+    sources = tuple(
+        _get_cached_scripts(plugin) for plugin in PluginRegistry.get_enabled()
+        if os_family is None or os_family in plugin.get_supported_os_families())
+
+    cached = _manifest_cache.get(os_family)
+    if (cached and len(cached[0]) == len(sources) and
+            all(old is new for old, new in zip(cached[0], sources))):
+        return cached[1], cached[2]
+
+    manifest = [
+        {k: v for k, v in script.items() if k != 'content'}
+        for scripts in sources for script in scripts]
+    body = json.dumps(manifest)
+    etag = '"{}"'.format(hashlib.sha256(body.encode()).hexdigest())
+    _manifest_cache[os_family] = (sources, body, etag)
+    return body, etag
+
+
+# (plugin name, scripts dir): (checked at, stamp, scripts)
+_script_cache = {}
+NO_SCRIPTS = ()
+# os_family: (script lists, JSON, ETag)
+_manifest_cache = {}
+
+
+def _get_cached_scripts(plugin):
+    """Return plugin's script dicts, rereading them if they've changed.
+
+    The same list is returned for as long as the scripts are unchanged.
+    """
     plugin_path = pathlib.Path(plugin.path) / 'scripts'
     server_path = (pathlib.Path(plugin.path).parent / 'scripts').absolute()
     if plugin_path.exists():
@@ -440,14 +478,31 @@ def get_plugin_scripts(plugin, hash_only=False, script_name=None):
     elif server_path.exists():
         scripts_dir = server_path
     else:
-        return results
-
-    if script_name:
-        dir_contents = [scripts_dir / script_name]
-    else:
-        dir_contents = (p for p in scripts_dir.iterdir() if p.suffix not in EXCLUDED_SCRIPT_TYPES)
+        # Shared, so the manifest cache sees it as unchanged.
+        return NO_SCRIPTS
+
+    key = (plugin.name, scripts_dir)
+    now = time.monotonic()
+    cached = _script_cache.get(key)
+    interval = get_django_setting('PLUGIN_SCRIPT_CHECK_INTERVAL', 10)
+    if cached and now - cached[0] < interval:
+        return cached[2]
+
+    paths = sorted(p for p in scripts_dir.iterdir() if p.suffix not in EXCLUDED_SCRIPT_TYPES)
+    stamp = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        stamp.append((path.name, stat.st_mtime_ns, stat.st_size))
+    stamp = tuple(stamp)
+    if cached and cached[1] == stamp:
+        _script_cache[key] = (now, stamp, cached[2])
+        return cached[2]
 
-    for script in dir_contents:
+    results = []
+    for script in paths:
         try:
             script_content = script.read_text()
             if not script_content.startswith('#!'):
@@ -457,36 +512,28 @@ def get_plugin_scripts(plugin, hash_only=False, script_name=None):
 
         script_output = {'plugin': plugin.name, 'filename': str(script.name)}
         script_output['hash'] = hashlib.sha256(script_content.encode()).hexdigest()
-        if not hash_only:
-            script_output['content'] = script_content
-
+        script_output['content'] = script_content
         results.append(script_output)
 
+    _script_cache[key] = (now, stamp, results)
     return results
 
 
 def run_plugin_processing(machine, report_data):
-    enabled_reports = Report.objects.all()
-    enabled_plugins = Plugin.objects.all()
-    enabled_detail_plugins = MachineDetailPlugin.objects.all()
-    for enabled_plugin in itertools.chain(enabled_reports, enabled_plugins, enabled_detail_plugins):
-        plugin = PluginManager.get_plugin_by_name(enabled_plugin.name)
-        if plugin:
-            plugin.checkin_processor(machine, report_data)
+    PluginRegistry.run_hook('checkin_processor', machine, report_data)
 
 
 def run_profiles_plugin_processing(machine, profiles_list):
-    enabled_plugins = Plugin.objects.all()
-    enabled_detail_plugins = MachineDetailPlugin.objects.all()
-    for enabled_plugin in itertools.chain(enabled_plugins, enabled_detail_plugins):
-        plugin = PluginManager.get_plugin_by_name(enabled_plugin.name)
-        if plugin:
-            plugin.profiles_processor(machine, profiles_list)
+    PluginRegistry.run_hook(
+        'profiles_processor', machine, profiles_list, models=(Plugin, MachineDetailPlugin))
 
 
 def load_default_plugins():
     """Add in default plugins if there are none configured."""
-    if not Plugin.objects.exists():
+    # An empty registry may just be stale in this process, so confirm
+    # with the table before inserting; inserting the defaults twice
+    # violates Plugin.name's unique constraint.
+    if not PluginRegistry.get_orders(Plugin) and not Plugin.objects.exists():
         for order, item in enumerate(PLUGIN_ORDER):
             Plugin.objects.create(name=item, order=order)
 
@@ -582,21 +629,43 @@ def get_member_oses(group_type='all', group_id=None):
 
 
 def get_hidden_plugins(group_type='all', group_id=None):
+    """Return the names of the plugins hidden from a group's dashboard.
+
+    Args:
+        group_type (str): 'all', 'business_unit', or 'machine_group'.
+        group_id (int or str): ID of the group, or None for 'all'.
+
+    Returns:
+        Sorted tuple of plugin names. The same tuple is returned for
+        every call with the same group.
+    """
+    lookup, default = _hidden_plugin_lookup()
     if group_type == 'all':
-        return settings.HIDE_PLUGIN_FROM_FRONT_PAGE
+        return lookup['all']
+    return lookup.get((group_type, str(group_id)), default)
 
-    # remove the plugins that are set to only be shown on the front page
-    hidden = settings.LIMIT_PLUGIN_TO_FRONT_PAGE
 
-    # remove the plugins that are to be hidden from this BU
-    hidden += [name for name, groups in settings.HIDE_PLUGIN_FROM_BUSINESS_UNIT.items() if group_id
-               in groups]
+@functools.lru_cache(maxsize=None)
+def _hidden_plugin_lookup():
+    """Build the hidden plugin names for every configured group.
 
-    # remove the plugins that are to be hidden from this Machine Group
-    hidden += [name for name, groups in settings.HIDE_PLUGIN_FROM_MACHINE_GROUP.items() if group_id
-               in groups]
+    Returns:
+        Tuple of a read-only mapping of 'all' or (group type, group ID)
+        to plugin names, and the names hidden from any other group.
+    """
+    # The plugins that are only shown on the front page are hidden
+    # from every group.
+    front_page_only = set(settings.LIMIT_PLUGIN_TO_FRONT_PAGE)
+    hidden = collections.defaultdict(lambda: set(front_page_only))
+    for group_type, setting in (('business_unit', settings.HIDE_PLUGIN_FROM_BUSINESS_UNIT),
+                                ('machine_group', settings.HIDE_PLUGIN_FROM_MACHINE_GROUP)):
+        for name, group_ids in setting.items():
+            for group_id in group_ids:
+                hidden[(group_type, str(group_id))].add(name)
 
-    return hidden
+    lookup = {key: tuple(sorted(names)) for key, names in hidden.items()}
+    lookup['all'] = tuple(sorted(set(settings.HIDE_PLUGIN_FROM_FRONT_PAGE)))
+    return types.MappingProxyType(lookup), tuple(sorted(front_page_only))
 
 
 def order_plugin_output(plugin_data):
@@ -614,19 +683,16 @@ def order_plugin_output(plugin_data):
 
 
 def get_report_names():
-    return Report.objects.values_list('name', flat=True)
+    return list(PluginRegistry.get_orders(Report))
 
 
 def get_plugin_placeholder_markup(group_type='all', group_id=None):
     result = []
     hidden = get_hidden_plugins(group_type, group_id)
     group_oses = get_member_oses(group_type, group_id)
-    display_plugins = [p for p in Plugin.objects.exclude(name__in=hidden).order_by('order')]
-    for enabled_plugin in display_plugins:
-        name = enabled_plugin.name
-        yapsy_plugin = PluginManager.get_plugin_by_name(name)
-        if not yapsy_plugin:
-            continue
+    display_plugins = [p for p in PluginRegistry.get_enabled(Plugin) if p.name not in hidden]
+    for yapsy_plugin in display_plugins:
+        name = yapsy_plugin.name
         # Skip this plugin if the group's members OS families aren't supported
         # ...but only if this group has any members (group_oses is not empty
         plugin_os_families = set(yapsy_plugin.get_supported_os_families())
@@ -643,13 +709,12 @@ def get_plugin_placeholder_markup(group_type='all', group_id=None):
 
 def get_machine_detail_placeholder_markup(machine):
     result = []
-    for enabled_plugin in MachineDetailPlugin.objects.order_by('order'):
-        plugin = PluginManager.get_plugin_by_name(enabled_plugin.name)
-        if plugin and machine.os_family in plugin.get_supported_os_families():
+    for plugin in PluginRegistry.get_enabled(MachineDetailPlugin):
+        if machine.os_family in plugin.get_supported_os_families():
             html = ('<div id="plugin-{}">'
                     '    <img class="center-block blue-spinner" src="{}"/>'
-                    '</div>'.format(enabled_plugin.name, static('img/blue-spinner.gif')))
+                    '</div>'.format(plugin.name, static('img/blue-spinner.gif')))
 
-            result.append({'name': enabled_plugin.name, 'html': html})
+            result.append({'name': plugin.name, 'html': html})
 
     return result
@@ -8,10 +8,15 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.context_processors import csrf
+from django.utils.html import escape
+
+from datatableview import Datatable
+from datatableview.views import DatatableView
 
 import sal.plugin
 from sal.decorators import (
-    required_level, ProfileLevel, access_required, is_global_admin, ga_required)
+    required_level, ProfileLevel, access_required, is_global_admin, ga_required,
+    class_login_required, class_access_required)
 from server.forms import (BusinessUnitForm, EditUserBusinessUnitForm, EditBusinessUnitForm,
                           MachineGroupForm, EditMachineGroupForm, NewMachineForm)
 from server.models import (BusinessUnit, MachineGroup, Machine, UserProfile, Report, Plugin,
@@ -31,6 +36,15 @@ STATUSES = {
     'ERROR': 'btn-danger',
     'UNKNOWN': 'btn-default'}
 
+# Facts shown in the machine detail page's management tool rows.
+MANAGEMENT_FACT_NAMES = {
+    'Munki': ('StartTime', 'EndTime', 'RunType'),
+    'Apple Software Update': ('catalog', 'last_check'),
+    'Salt': ('saltversion', 'pythonversion', 'Last Highstate'),
+    'Puppet': ('puppet_version', 'puppet_errors', 'last_puppet_run'),
+}
+DETAIL_FACT_NAMES = {'ipv4_address'}.union(*MANAGEMENT_FACT_NAMES.values())
+
 
 logger = logging.getLogger(__name__)
 
@@ -108,7 +122,7 @@ def report_load(request, plugin_name, group_type='all', group_id=None):
     groups = utils.get_instance_and_groups(group_type, group_id)
     plugin_object = process_plugin(plugin_name, group_type, group_id)
     report_html = plugin_object.widget_content(request, group_type=group_type, group_id=group_id)
-    reports = Report.objects.values_list('name', flat=True)
+    reports = utils.get_report_names()
     context = {'output': report_html, 'group_type': group_type, 'group_id': group_id, 'reports':
                reports, 'active_report': plugin_object, 'groups': groups}
     return render(request, 'server/display_report.html', context)
@@ -308,32 +322,41 @@ def machine_detail(request, **kwargs):
     machine_group = machine.machine_group
     business_unit = machine_group.business_unit
 
-    try:
-        ip_address_fact = machine.facts.get(fact_name='ipv4_address')
-        ip_address = ip_address_fact.fact_data
-    except (Fact.MultipleObjectsReturned, Fact.DoesNotExist):
-        ip_address = None
-
-    if Plugin.objects.filter(name='Uptime'):
+    # Fetch the few facts shown on this page in one query.
+    facts = defaultdict(list)
+    fact_rows = (
+        machine.facts
+        .filter(fact_name__in=DETAIL_FACT_NAMES)
+        .order_by()
+        .values_list('management_source__name', 'fact_name', 'fact_data'))
+    for source_name, fact_name, fact_data in fact_rows:
+        facts[(source_name, fact_name)].append(fact_data)
+
+    ip_addresses = [data for (_, name), values in facts.items() if name == 'ipv4_address' for data in values]
+    ip_address = ip_addresses[0] if len(ip_addresses) == 1 else None
+
+    if 'Uptime' in sal.plugin.PluginRegistry.get_orders(Plugin):
+        uptime_seconds = (
+            PluginScriptRow.objects
+            .filter(
+                submission__machine=machine, submission__plugin='Uptime',
+                pluginscript_name='UptimeSeconds')
+            .values_list('pluginscript_data', flat=True)
+            .first())
         try:
-            plugin_script_submission = PluginScriptSubmission.objects.get(
-                machine=machine, plugin='Uptime')
-            uptime_seconds = PluginScriptRow.objects.get(
-                submission=plugin_script_submission,
-                pluginscript_name='UptimeSeconds').pluginscript_data
-        except Exception:
-            uptime_seconds = '0'
-
-        uptime = utils.display_time(int(uptime_seconds))
+            uptime = utils.display_time(int(uptime_seconds))
+        except (TypeError, ValueError):
+            uptime = utils.display_time(0)
     else:
         uptime = None
 
     output = utils.get_machine_detail_placeholder_markup(machine)
 
     # Process machine's managed items for display in the template.
-    managed_items_queryset = ManagedItem.objects.filter(machine=machine)
+    managed_items_list = list(
+        ManagedItem.objects.filter(machine=machine).select_related('management_source'))
     managed_items = defaultdict(dict)
-    for item in managed_items_queryset:
+    for item in managed_items_list:
         if item.data:
             try:
                 data = json.loads(item.data)
@@ -345,19 +368,16 @@ def machine_detail(request, **kwargs):
         # Structure is a dict with keys for each source; each source
         # will then have as many sub types as ManagedItem.data "types".
         # The final structure is a list of ManagedItems.
-        data_type = data.get('type')
-        if data_type not in managed_items[item.management_source.name]:
-            managed_items[item.management_source.name][data.get('type')] = []
-        managed_items[item.management_source.name][data.get('type')].append(item)
+        managed_items[item.management_source.name].setdefault(data.get('type'), []).append(item)
 
     # Process histories for use in item modals.
-    history_queryset = machine.manageditemhistory_set.all()
+    history_queryset = machine.manageditemhistory_set.select_related('management_source')
     histories = {}
     for item in history_queryset:
         histories.setdefault(f'{item.management_source.name}||{item.name}', []).append(item)
 
     # Determine pending updates
-    pending = managed_items_queryset.filter(status="PENDING")
+    pending = [item for item in managed_items_list if item.status == 'PENDING']
 
     # Determine which tab to display first.
     # TODO: Do we just use the first, or configure for each OS / source?
@@ -370,7 +390,7 @@ def machine_detail(request, **kwargs):
         active_table = list(managed_items[initial_source].keys())[0] if initial_source else ''
 
     messages = {}
-    for message in machine.messages.all():
+    for message in machine.messages.select_related('management_source'):
         messages.setdefault(message.message_type, []).append(message)
 
     context = {
@@ -380,7 +400,7 @@ def machine_detail(request, **kwargs):
         'messages': messages,
         'managed_items': dict(managed_items),
         'histories': histories,
-        'management_tools': _get_management_tools(managed_items.keys(), machine),
+        'management_tools': _get_management_tools(managed_items.keys(), machine, facts),
         'pending': pending,
         'fact_sources': get_fact_sources(machine),
         'initial_source': initial_source,
@@ -402,12 +422,12 @@ def get_fact_sources(machine):
         .distinct())
 
 
-def _get_management_tools(source_names, machine):
+def _get_management_tools(source_names, machine, facts):
     row_funcs = {
         'Munki': _munki_facts,
         'Apple Software Update': _sus_facts,
-        # Want to show data about a management source? Implement a func and
-        # change here...
+        # Want to show data about a management source? Implement a func,
+        # list its facts in MANAGEMENT_FACT_NAMES, and change here...
         'Puppet': _not_implemented_facts,
         'Salt': _salt_facts,
         'Chef': _not_implemented_facts,
@@ -415,80 +435,101 @@ def _get_management_tools(source_names, machine):
     }
     management_tool_info = []
     for source_name in source_names:
-        management_tool_info.extend(row_funcs.get(source_name, _not_implemented_facts)(machine))
+        management_tool_info.extend(
+            row_funcs.get(source_name, _not_implemented_facts)(machine, facts))
 
     return sorted(management_tool_info)
 
 
-def _get_management_facts(machine, source_name, fact_names, prefix=None):
+def _get_management_facts(facts, source_name, prefix=None):
     result = []
     if prefix is None:
         prefix = source_name
-    for fact_name in fact_names:
-        try:
-            fact = machine.facts.get(management_source__name=source_name, fact_name=fact_name)
-            result.append((f'{prefix} {fact_name}', fact.fact_data))
-        except Fact.DoesNotExist:
-            pass
+    for fact_name in MANAGEMENT_FACT_NAMES[source_name]:
+        if (source_name, fact_name) in facts:
+            result.append((f'{prefix} {fact_name}', facts[(source_name, fact_name)][0]))
 
     return result
 
 
-def _munki_facts(machine):
-    info_names = ('StartTime', 'EndTime', 'RunType')
-    rows = _get_management_facts(machine, 'Munki', info_names)
+def _munki_facts(machine, facts):
+    rows = _get_management_facts(facts, 'Munki')
     rows.append(('Munki Manifest', machine.manifest))
     rows.append(('Munki Version', machine.munki_version))
 
     return rows
 
 
-def _sus_facts(machine):
-    info_names = ('catalog', 'last_check')
-    rows = _get_management_facts(machine, 'Apple Software Update', info_names, prefix='SUS')
+def _sus_facts(machine, facts):
+    rows = _get_management_facts(facts, 'Apple Software Update', prefix='SUS')
     return rows
 
 
-def _salt_facts(machine):
-    info_names = ('saltversion', 'pythonversion', 'Last Highstate')
-    rows = _get_management_facts(machine, 'Salt', info_names)
+def _salt_facts(machine, facts):
+    rows = _get_management_facts(facts, 'Salt')
     return rows
 
 
-def _puppet_facts(machine):
-    info_names = ('puppet_version', 'puppet_errors', 'last_puppet_run')
-    rows = _get_management_facts(machine, 'Puppet', info_names)
+def _puppet_facts(machine, facts):
+    rows = _get_management_facts(facts, 'Puppet')
     return rows
 
 
-def _not_implemented_facts(machine):
+def _not_implemented_facts(machine, facts):
     return []
 
 
-@login_required
-@access_required(Machine)
-def machine_detail_facts(request, machine_id, management_source, **kwargs):
-    machine = kwargs['instance']
-    if management_source == 'None':
-        management_source = None
-    if machine.facts.count() != 0:
-        facts = machine.facts.filter(management_source__name=management_source)
+class FactList(Datatable):
+
+    class Meta:
+        columns = ['fact_name', 'fact_data']
+        labels = {'fact_name': 'Fact', 'fact_data': 'Data'}
+        processors = {'fact_name': 'escape_value', 'fact_data': 'escape_value'}
+        structure_template = 'datatableview/bootstrap_structure.html'
+
+    def escape_value(self, instance, default_value, **kwargs):
+        # Fact data comes from clients; datatableview doesn't escape it.
+        return escape(default_value)
+
+
+@class_login_required
+@class_access_required
+class MachineDetailFactsView(DatatableView):
+    """Pages, orders and searches a machine's facts from one source."""
+
+    model = Fact
+    template_name = 'server/machine_detail_facts.html'
+    datatable_class = FactList
+
+    @classmethod
+    def get_business_unit(cls, machine_id, **kwargs):
+        machine = get_object_or_404(
+            Machine.objects.select_related('machine_group__business_unit'), pk=machine_id)
+        return machine.machine_group.business_unit
+
+    def get_queryset(self):
+        self.machine = get_object_or_404(Machine, pk=self.kwargs['machine_id'])
+        self.management_source = self.kwargs['management_source']
+        if self.management_source == 'None':
+            self.management_source = None
+
+        facts = self.machine.facts.filter(management_source__name=self.management_source)
         if settings.EXCLUDED_FACTS:
             facts = facts.exclude(fact_name__in=settings.EXCLUDED_FACTS)
-    else:
-        facts = None
-
-    source_name = management_source if management_source else 'Legacy'
-    title = f'{source_name} Facts for {machine.hostname}'
-    context = {
-        'user': request.user,
-        'machine': machine,
-        'fact_sources': get_fact_sources(machine),
-        'table_data': facts,
-        'title': title,
-        'page_length': utils.get_setting('datatable_page_length')
-    }
-    return render(request, 'server/machine_detail_facts.html', context)
+        return facts
+
+    def get_datatable_kwargs(self, **kwargs):
+        kwargs = super(MachineDetailFactsView, self).get_datatable_kwargs(**kwargs)
+        kwargs['page_length'] = utils.get_setting('datatable_page_length')
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super(MachineDetailFactsView, self).get_context_data(**kwargs)
+        source_name = self.management_source if self.management_source else 'Legacy'
+        context['machine'] = self.machine
+        context['fact_sources'] = get_fact_sources(self.machine)
+        context['title'] = f'{source_name} Facts for {self.machine.hostname}'
+        return context
 
 
 @login_required
@@ -4,16 +4,18 @@
 import csv
 import io
 import itertools
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from django.db.models.query import QuerySet
-from django.http import StreamingHttpResponse
+from django.http import HttpRequest, StreamingHttpResponse
 
 import server.models
 import server.utils
+import utils.streaming
 import utils.text_utils
 
 
+CHUNK_SIZE = 2000
 IGNORED_CSV_FIELDS = ('id', 'machine_group', 'report')
 MACHINE_FIELDS = [
     field.name for field in server.models.Machine._meta.get_fields()
@@ -56,22 +58,40 @@ def machine_fields():
     return machine_fields
 
 
-def get_csv_response(queryset: QuerySet,
+def queryset_rows(queryset: QuerySet, fields: Dict) -> Iterator[Tuple]:
+    """Fetch the rows for a fields dict (see row_helper) from the database
+
+    Dotted references become lookups, so related values are joined in
+    the query rather than fetched per row, and rows are read in chunks.
+    """
+    lookups = [
+        reference.replace('.', '__') if reference else name for name, reference in fields.items()]
+    return queryset.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+def get_csv_response(queryset: Iterable,
                      fields: dict,
-                     title: str) -> StreamingHttpResponse:
+                     title: str,
+                     request: HttpRequest = None) -> StreamingHttpResponse:
     writer = csv.writer(PassthroughIO())
 
     # Nest field names into an iterable of 1 so it can be chained.
     # Add in our two foreign key traversals by name.
     headers = [fields.keys()]
-    data = (row_helper(item, fields) for item in queryset)
+    if isinstance(queryset, QuerySet):
+        data = queryset_rows(queryset, fields)
+    else:
+        data = (row_helper(item, fields) for item in queryset)
     # Chain the headers and the data into a single iterator.
     generator = (writer.writerow(row) for row in itertools.chain(headers, data))
 
     # Streaming responses require a generator; which is good, as it can
     # process machines one by one rather than shoving the entire output
     # into memory.
-    response = StreamingHttpResponse(generator, content_type="text/csv")
+    if request:
+        response = utils.streaming.streaming_response(request, generator, "text/csv")
+    else:
+        response = StreamingHttpResponse(generator, content_type="text/csv")
     # If DEBUG_CSV  is enabled, just print output rather than download.
     if not server.utils.get_django_setting('DEBUG_CSV', False):
         response['Content-Disposition'] = 'attachment; filename="%s.csv"' % title
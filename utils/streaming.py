@@ -0,0 +1,42 @@
+"""Helpers for streaming responses"""
+
+
+import zlib
+from typing import Iterable
+
+from django.http import StreamingHttpResponse
+
+
+# Gather this much uncompressed output before compressing a chunk.
+GZIP_CHUNK_SIZE = 64 * 1024
+
+
+def accepts_gzip(request) -> bool:
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterable[bytes]:
+    """Gzip an iterable of strings, without holding it all in memory."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= GZIP_CHUNK_SIZE:
+            yield compressor.compress(b''.join(buffer))
+            buffer = []
+            size = 0
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
+
+def streaming_response(request, chunks: Iterable[str], content_type: str) -> StreamingHttpResponse:
+    """Stream chunks, gzipped if the client accepts it."""
+    if accepts_gzip(request):
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Vary'] = 'Accept-Encoding'
+    return response
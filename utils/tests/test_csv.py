@@ -0,0 +1,50 @@
+"""Tests for the CSV utilities."""
+
+
+import csv
+import gzip
+import io
+
+from django.test import RequestFactory, TestCase
+
+import utils.csv
+from server.models import Machine
+
+
+class CSVResponseTest(TestCase):
+    """Test streaming machine CSVs."""
+
+    fixtures = [
+        'machine_group_fixtures.json', 'business_unit_fixtures.json', 'machine_fixtures.json']
+
+    def read_rows(self, response):
+        content = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return list(csv.DictReader(io.StringIO(content.decode())))
+
+    def test_queryset_related_values(self):
+        """Ensure related values are joined rather than queried per machine."""
+        machines = Machine.objects.all()
+        with self.assertNumQueries(1):
+            response = utils.csv.get_csv_response(machines, utils.csv.machine_fields(), 'test')
+            rows = self.read_rows(response)
+
+        expected = {m.serial: m.machine_group.business_unit.name for m in machines}
+        self.assertEqual({row['serial']: row['business unit'] for row in rows}, expected)
+
+    def test_iterable_matches_queryset(self):
+        """Ensure other iterables of objects produce the same output."""
+        fields = utils.csv.machine_fields()
+        machines = Machine.objects.order_by('pk')
+        from_queryset = self.read_rows(utils.csv.get_csv_response(machines, fields, 'test'))
+        from_list = self.read_rows(utils.csv.get_csv_response(list(machines), fields, 'test'))
+        self.assertEqual(from_queryset, from_list)
+
+    def test_gzip(self):
+        """Ensure the response is gzipped for clients that accept it."""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = utils.csv.get_csv_response(
+            Machine.objects.all(), utils.csv.machine_fields(), 'test', request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(self.read_rows(response)), Machine.objects.count())